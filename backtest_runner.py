@@ -0,0 +1,171 @@
+"""
+Backtest Runner - Indicator, signal and exit phases on a process pool
+Workers memory-map the price store's .npy files themselves, so no price
+DataFrames are pickled: only the small VIX arrays and configs are sent to
+each worker once (pool initializer), and each ticker's trades come back as
+a few short arrays. Results are merged in input ticker order, so the
+output does not depend on how the pool scheduled the work.
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from price_store import PriceStore, records_to_frame, BENCHMARK_TICKERS
+from calendar_index import to_day, align
+from strategy import signal_mask, mask_arrays, apply_min_gap, fundamentals_gate
+from indicators import compute_indicators, build_panel
+from exit_engine import simulate_exits
+
+# VIX value used on bars with no VIX close (matches the screener)
+VIX_DEFAULT = 15.0
+
+_worker = {}
+
+
+def stored_tickers(store):
+    """Every tradable ticker in a PriceStore (benchmarks and indices excluded)"""
+    return sorted(t for t in store.index if t not in BENCHMARK_TICKERS and not t.startswith('^'))
+
+
+def gate_fundamentals(tickers, fundamentals, fetch_infos, cfg, batch_size=100):
+    """
+    {ticker: (info, fund_details)}, in input order, for the tickers whose
+    .info (through a FundamentalsCache) passes fundamentals_gate: the
+    universe the backtest, sweep and walk-forward all trade. Saves the cache.
+    """
+    eligible = {}
+    for b in range(0, len(tickers), batch_size):
+        batch = tickers[b:b + batch_size]
+        infos = fundamentals.get_many(batch, fetch_infos)
+        for ticker in batch:
+            if ticker in infos:
+                status, fund_score, fund_details = fundamentals_gate(infos[ticker], cfg)
+                if status == 'success':
+                    eligible[ticker] = (infos[ticker], fund_details)
+        print(f"  [{b + len(batch):4d}/{len(tickers)}] Passed fundamentals: {len(eligible):4d}")
+    fundamentals.save()
+    return eligible
+
+
+def ticker_arrays(rec, vix_days, vix_close, sma_slope_days=20, volume_avg_days=50, ind=None):
+    """
+    (high, low, mask arrays) for one ticker: prices, indicators and aligned
+    VIX. ind holds the ticker's indicator arrays when already computed (panel_arrays).
+    """
+    df = records_to_frame(rec)
+    if ind is None:
+        ind = {k: v.values for k, v in compute_indicators(df['Close'], df['High'], df['Low'], df['Volume'],
+                                                          sma_slope_days, volume_avg_days).items()}
+    vix = align(vix_days, vix_close, np.asarray(rec['day']), VIX_DEFAULT)
+    a = mask_arrays(df['Close'].values, df['Volume'].values, ind['rsi'], ind['adx'], ind['sma_200'],
+                    ind['sma_slope'], ind['high_52w'], ind['vol_avg'], vix)
+    return df['High'].values, df['Low'].values, a
+
+
+def panel_arrays(recs, vix_days, vix_close, sma_slope_days=20, volume_avg_days=50):
+    """
+    ticker_arrays for many tickers at once: indicators are computed in one
+    pass over a dates x tickers panel on their union calendar. A ticker with
+    a gap on that calendar (a bar others have and it lacks, other than
+    before its listing or after its last bar) would see NaN bars mid-series,
+    so it is computed on its own instead.
+    """
+    panel = build_panel({t: records_to_frame(rec) for t, rec in recs.items()})
+    ind = compute_indicators(panel['Close'], panel['High'], panel['Low'], panel['Volume'],
+                             sma_slope_days, volume_avg_days)
+    ind = {k: v.values for k, v in ind.items()}
+    listed = panel['Close'].notna().values
+    first = listed.argmax(axis=0)
+    out = {}
+    for j, (ticker, rec) in enumerate(recs.items()):
+        lo, hi = first[j], first[j] + len(rec)
+        if hi <= len(listed) and listed[lo:hi, j].all():
+            # Copies, so the panel is freed once the chunk is done
+            column = {k: np.ascontiguousarray(v[lo:hi, j]) for k, v in ind.items()}
+            out[ticker] = ticker_arrays(rec, vix_days, vix_close, ind=column)
+        else:
+            out[ticker] = ticker_arrays(rec, vix_days, vix_close, sma_slope_days, volume_avg_days)
+    return out
+
+
+def window(rec, start_day, end_day, min_bars):
+    """Records in [start_day, end_day) or None if fewer than min_bars"""
+    if rec is None:
+        return None
+    lo, hi = np.searchsorted(rec['day'], [start_day, end_day])
+    return rec[lo:hi] if hi - lo >= min_bars else None
+
+
+def backtest_records(rec, vix_days, vix_close, signal_cfg, exit_cfg, sma_slope_days=20, volume_avg_days=50):
+    """
+    Trades for one ticker's PRICE_DTYPE records. Returns a dict of arrays,
+    one value per trade; dates are epoch days (exit_date -1 while open).
+    """
+    high, low, a = ticker_arrays(rec, vix_days, vix_close, sma_slope_days, volume_avg_days)
+    close, vix, days = a['close'], a['vix'], np.asarray(rec['day'])
+    mask = signal_mask(close, a['volume'], a['rsi'], a['adx'], a['sma_200'], a['sma_slope'],
+                       a['high_52w'], a['vol_avg'], vix, signal_cfg)
+    entries = apply_min_gap(mask, signal_cfg.min_gap_days)
+    exits = simulate_exits(close, high, low, entries, exit_cfg)
+
+    return {
+        'entry_date': days[entries],
+        'entry_price': close[entries],
+        'vix': vix[entries],
+        'exit_date': np.where(exits['exit_idx'] >= 0, days[exits['exit_idx']], -1),
+        'exit_price': exits['exit_price'],
+        'return_pct': exits['return_pct'],
+        'exit_day': exits['exit_day'],
+        'reason': exits['reason'],
+        'trailing_activated': exits['trailing_activated'],
+    }
+
+
+def _init_worker(store_root, vix_days, vix_close, params):
+    _worker.clear()
+    _worker.update(params, store=PriceStore(store_root), vix_days=vix_days, vix_close=vix_close)
+
+
+def _run_ticker(ticker):
+    """(status, trades) for one ticker using the worker's store and config"""
+    w = _worker
+    try:
+        rec = window(w['store'].read(ticker), w['start_day'], w['end_day'], w['min_bars'])
+        if rec is None:
+            return 'no_data', None
+        trades = backtest_records(rec, w['vix_days'], w['vix_close'], w['signal_cfg'], w['exit_cfg'],
+                                  w['sma_slope_days'], w['volume_avg_days'])
+        return 'success', trades
+    except Exception:
+        return 'error', None
+
+
+def run_tickers(tickers, store_root, vix_days, vix_close, signal_cfg, exit_cfg, start_date, end_date,
+                min_bars=500, sma_slope_days=20, volume_avg_days=50, workers=None, chunksize=8):
+    """
+    Backtest every ticker already in the price store over [start_date, end_date).
+    Returns ({ticker: trades} in input order, {status: count}).
+    workers=1 runs in-process (no pool).
+    """
+    params = {
+        'signal_cfg': signal_cfg, 'exit_cfg': exit_cfg,
+        'start_day': to_day(start_date), 'end_day': to_day(end_date), 'min_bars': min_bars,
+        'sma_slope_days': sma_slope_days, 'volume_avg_days': volume_avg_days,
+    }
+    init_args = (store_root, np.asarray(vix_days), np.asarray(vix_close), params)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(tickers) <= 1:
+        _init_worker(*init_args)
+        outcomes = [_run_ticker(t) for t in tickers]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            outcomes = list(pool.map(_run_ticker, tickers, chunksize=chunksize))
+
+    results, counts = {}, {}
+    for ticker, (status, trades) in zip(tickers, outcomes):
+        counts[status] = counts.get(status, 0) + 1
+        if trades is not None:
+            results[ticker] = trades
+    return results, counts
@@ -0,0 +1,278 @@
+"""
+Benchmarks - Per-stage time and peak memory of the scan and backtest hot paths
+Runs offline on SyntheticSource data for every combination of universe size
+and history length, and writes one JSON file per run to benchmarks/results/
+(named by date and commit) so runs can be compared across commits.
+
+History lengths are years of bars after the strategy's indicator warm-up.
+Each stage is timed once, then run again under tracemalloc for its peak
+Python/NumPy allocation (--no-memory skips the second run).
+
+Usage:
+  python benchmarks/run_benchmarks.py                     # 500/1,500/6,000 tickers x 1y/6y
+  python benchmarks/run_benchmarks.py --quick --compare   # 500 x 1y, vs the last results file
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+import contextlib
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'worker'))
+
+import numpy as np
+import pandas as pd
+
+from data_source import SyntheticSource, SYNTHETIC_END_DATE
+from price_store import PriceStore
+from calendar_index import to_day
+from indicators import calc_rsi, calc_adx
+from strategy import StrategyConfig, signal_mask, apply_min_gap
+from exit_engine import ExitConfig, simulate_exits
+from backtest_runner import ticker_arrays, run_tickers
+from indicator_state import IndicatorStateStore
+from fundamentals_cache import FundamentalsCache
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+UNIVERSE_SIZES = (500, 1500, 6000)
+HISTORY_YEARS = (1, 6)
+BARS_PER_YEAR = 252
+
+# Synthetic bars behind the live scan stages (covers the worker's HISTORY_DAYS)
+SCAN_BARS = 300
+
+
+def commit_id():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or 'unknown'
+    except OSError:
+        return 'unknown'
+
+
+def measure(run, setup=None, memory=True):
+    """{'seconds', 'peak_mb'} for run(setup()); setup is not measured"""
+    ctx = setup() if setup else None
+    with contextlib.redirect_stdout(io.StringIO()):
+        t = time.perf_counter()
+        run(ctx)
+        seconds = time.perf_counter() - t
+
+        peak = None
+        if memory:
+            ctx = setup() if setup else None
+            tracemalloc.start()
+            run(ctx)
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+    return {'seconds': round(seconds, 4), 'peak_mb': None if peak is None else round(peak, 1)}
+
+
+# =============================================================================
+# CASE
+# =============================================================================
+def run_case(n_tickers, years, workdir, workers=1, memory=True, scan=None):
+    """
+    Every stage for one universe size and history length -> {stage: result}.
+    scan is the universe size's scan_stages() result, shared by every length.
+    """
+    signal_cfg, exit_cfg = StrategyConfig(), ExitConfig()
+    n_bars = signal_cfg.warmup_bars + years * BARS_PER_YEAR
+    source = SyntheticSource(n_tickers=n_tickers, n_bars=n_bars, end_date=SYNTHETIC_END_DATE)
+    tickers = source.universe()
+    start, end = str(source.index[0].date()), SYNTHETIC_END_DATE
+    vix_days, vix_close = source.vix(start, end)
+    frames = source.price_batch(tickers, start, end)
+    store_root = os.path.join(workdir, 'prices')
+    PriceStore(store_root).update(tickers, start, end, lambda batch, s, e: {t: frames[t] for t in batch},
+                                  benchmarks=False)
+    store = PriceStore(store_root)
+    stages = {}
+
+    def fresh_dir(name):
+        path = os.path.join(workdir, name)
+        shutil.rmtree(path, ignore_errors=True)
+        return path
+
+    stages['generate'] = measure(lambda _: source.price_batch(tickers, start, end), memory=memory)
+    stages['store_write'] = measure(
+        lambda root: PriceStore(root).update(tickers, start, end, lambda batch, s, e: {t: frames[t] for t in batch},
+                                            benchmarks=False),
+        lambda: fresh_dir('write'), memory)
+    stages['store_read'] = measure(lambda _: [np.array(store.read(t)['close']) for t in tickers], memory=memory)
+
+    series = {t: (pd.Series(df['Close'].values), pd.Series(df['High'].values), pd.Series(df['Low'].values))
+              for t, df in frames.items()}
+    stages['rsi'] = measure(lambda _: [calc_rsi(c) for c, h, l in series.values()], memory=memory)
+    stages['adx'] = measure(lambda _: [calc_adx(h, l, c) for c, h, l in series.values()], memory=memory)
+
+    recs = {t: store.read(t) for t in tickers}
+    stages['indicators'] = measure(
+        lambda _: [ticker_arrays(rec, vix_days, vix_close) for rec in recs.values()], memory=memory)
+
+    prepared = [ticker_arrays(rec, vix_days, vix_close) for rec in recs.values()]
+
+    def entries_of(a):
+        mask = signal_mask(a['close'], a['volume'], a['rsi'], a['adx'], a['sma_200'], a['sma_slope'],
+                           a['high_52w'], a['vol_avg'], a['vix'], signal_cfg)
+        return apply_min_gap(mask, signal_cfg.min_gap_days)
+
+    stages['signals'] = measure(lambda _: [entries_of(a) for high, low, a in prepared], memory=memory)
+    entries = [entries_of(a) for high, low, a in prepared]
+    stages['exits'] = measure(
+        lambda _: [simulate_exits(a['close'], high, low, e, exit_cfg)
+                   for (high, low, a), e in zip(prepared, entries)], memory=memory)
+
+    stages['backtest'] = measure(
+        lambda _: run_tickers(tickers, store_root, vix_days, vix_close, signal_cfg, exit_cfg, start, end,
+                              min_bars=signal_cfg.warmup_bars, workers=workers), memory=memory)
+
+    stages.update(scan or {})
+    return {'tickers': n_tickers, 'years': years, 'bars': n_bars, 'stages': stages}
+
+
+def scan_stages(n_tickers, workdir, memory=True):
+    """
+    The live worker's technical + fundamentals stages. The worker always reads
+    the last HISTORY_DAYS up to today, so these use their own synthetic market
+    ending today whatever the case's history length:
+      scan       - cold run: empty price store, indicator state and fundamentals cache
+      scan_daily - the next day: one new bar per ticker on top of a seeded run
+    """
+    import screener_worker as worker
+    today = datetime.now()
+    # Ends on the last completed session before today: the worker downloads up to
+    # today (exclusive), so the daily run always has exactly that one bar to apply
+    source = SyntheticSource(n_tickers=n_tickers, n_bars=SCAN_BARS, end_date=today.strftime('%Y-%m-%d'))
+    tickers = source.universe()
+    start = (today - timedelta(days=worker.HISTORY_DAYS)).strftime('%Y-%m-%d')
+    last_bar = str(source.index[-1].date())
+    vix_days, vix_close = source.vix(start, today.strftime('%Y-%m-%d'))
+    root = os.path.join(workdir, 'scan')
+
+    def scan(download):
+        stats = {'success': 0, 'skipped': 0, 'error': 0, 'tickers': len(tickers), 'signals': 0, 'stages': []}
+        store = PriceStore(os.path.join(root, 'prices'))
+        states = IndicatorStateStore(os.path.join(root, 'indicator_state'),
+                                     sma_slope_days=worker.SMA_SLOPE_DAYS, volume_avg_days=worker.VOLUME_AVG_DAYS,
+                                     tail_size=worker.LOOKBACK_DAYS + worker.SIGNAL_CONFIG.rsi_lookback + 1)
+        fundamentals = FundamentalsCache(os.path.join(root, 'fundamentals.json'), worker.FUNDAMENTALS_TTL_DAYS)
+        worker.drain(worker.scan_pipeline(tickers, vix_days, vix_close, set(), store, states, fundamentals,
+                                          download, source.infos, stats))
+
+    def cold():
+        shutil.rmtree(root, ignore_errors=True)
+
+    def seeded():
+        # Yesterday's run: every bar but the last, then mark the store as checked yesterday
+        cold()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scan(lambda batch, s, e: source.price_batch(batch, s, last_bar))
+        store = PriceStore(os.path.join(root, 'prices'))
+        behind = {int(store.read(t)['day'][-1]) for t in tickers}
+        assert behind == {to_day(source.index[-2])}, f"seeded store should end one bar before {last_bar}"
+        for meta in store.index.values():
+            meta['checked'] -= 1
+        store.save_index()
+
+    return {
+        'scan': measure(lambda _: scan(source.price_batch), cold, memory),
+        'scan_daily': measure(lambda _: scan(source.price_batch), seeded, memory),
+    }
+
+
+# =============================================================================
+# REPORT
+# =============================================================================
+def print_case(case):
+    print(f"\n{case['tickers']} tickers x {case['years']}y ({case['bars']} bars)")
+    print(f"{'Stage':<12} {'Seconds':>9} {'Peak MB':>9}")
+    for name, r in case['stages'].items():
+        peak = '-' if r['peak_mb'] is None else f"{r['peak_mb']:.1f}"
+        print(f"{name:<12} {r['seconds']:>9.3f} {peak:>9}")
+
+
+def latest_result(exclude=None):
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    files = sorted(f for f in os.listdir(RESULTS_DIR) if f.endswith('.json'))
+    files = [os.path.join(RESULTS_DIR, f) for f in files]
+    files = [f for f in files if f != exclude]
+    return files[-1] if files else None
+
+
+def print_comparison(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    old = {(c['tickers'], c['years']): c['stages'] for c in previous['cases']}
+    print(f"\nvs {os.path.basename(previous_path)} (commit {previous['commit']}): time ratio, <1 is faster")
+    for case in current['cases']:
+        before = old.get((case['tickers'], case['years']))
+        if before is None:
+            continue
+        ratios = [f"{name} {r['seconds'] / before[name]['seconds']:.2f}x"
+                  for name, r in case['stages'].items() if before.get(name, {}).get('seconds')]
+        print(f"  {case['tickers']} x {case['years']}y: " + ', '.join(ratios))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scan and backtest benchmarks on synthetic data')
+    parser.add_argument('--tickers', type=int, nargs='+', default=list(UNIVERSE_SIZES), help='universe sizes')
+    parser.add_argument('--years', type=int, nargs='+', default=list(HISTORY_YEARS), help='history lengths')
+    parser.add_argument('--quick', action='store_true', help='smallest case only (500 tickers x 1y)')
+    parser.add_argument('--workers', type=int, default=1, help='processes for the backtest stage')
+    parser.add_argument('--no-memory', action='store_true', help='time only (skip the tracemalloc run)')
+    parser.add_argument('--compare', nargs='?', const='latest', help='compare with a results file (default: latest)')
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.tickers, args.years = [min(args.tickers)], [min(args.years)]
+
+    result = {
+        'commit': commit_id(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'workers': args.workers,
+        'cases': [],
+    }
+
+    workdir = tempfile.mkdtemp(prefix='sniper-bench-')
+    try:
+        for n in args.tickers:
+            # The scan stages don't depend on history length: measure them once per universe size
+            scan = scan_stages(n, workdir, not args.no_memory)
+            for years in args.years:
+                case = run_case(n, years, workdir, args.workers, not args.no_memory, scan)
+                result['cases'].append(case)
+                print_case(case)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{result['commit']}.json")
+    previous = latest_result() if args.compare == 'latest' else args.compare
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=1)
+    print(f"\nResults saved to {path}")
+
+    if previous:
+        print_comparison(result, previous)
+    return result
+
+
+if __name__ == '__main__':
+    main()
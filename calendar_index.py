@@ -0,0 +1,38 @@
+"""
+Calendar Index - Integer epoch-day dates
+Dates are int64 days since 1970-01-01 inside the screener and backtest
+(VIX alignment, dedup keys, signal records). 'YYYY-MM-DD' strings are only
+produced where data leaves for Supabase or CSV.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def to_day(date):
+    """Date-like -> int epoch day"""
+    return int(pd.Timestamp(date).normalize().value // 86_400_000_000_000)
+
+
+def from_day(day):
+    """int epoch day -> 'YYYY-MM-DD'"""
+    return str(np.datetime64(int(day), 'D'))
+
+
+def to_days(dates):
+    """DatetimeIndex / sequence of dates or 'YYYY-MM-DD' strings -> int64 epoch days"""
+    return np.asarray(pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype(np.int64))
+
+
+def format_days(days):
+    """Array of epoch days -> array of 'YYYY-MM-DD' strings"""
+    return np.asarray(days, dtype='datetime64[D]').astype(str)
+
+
+def align(days, values, on, default=np.nan):
+    """values (sorted by `days`) looked up for each epoch day in `on`; default where missing"""
+    on = np.asarray(on)
+    if len(days) == 0:
+        return np.full(on.shape, default, dtype=np.float64)
+    pos = np.searchsorted(days, on).clip(max=len(days) - 1)
+    return np.where(days[pos] == on, values[pos], default)
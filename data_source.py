@@ -0,0 +1,226 @@
+"""
+Data Source - Where prices, fundamentals, VIX and the ticker universe come from
+The worker and the backtester only talk to a DataSource:
+  YahooSource     - yfinance over the network through a rate-limited FetchScheduler
+  CacheSource     - only what is already in the local price store / fundamentals cache
+  SyntheticSource - deterministic generated market (e.g. 6,000 tickers x 1,500 bars)
+                    so scans and benchmarks run offline and reproducibly
+"""
+
+import os
+import json
+import zlib
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore, download_price_batch, COLUMNS, BENCHMARK_TICKERS
+from calendar_index import to_days
+from fetch_engine import FetchScheduler
+
+SYNTHETIC_END_DATE = '2025-12-31'
+SECTORS = ('Technology', 'Healthcare', 'Financial Services', 'Industrials', 'Consumer Cyclical',
+           'Energy', 'Utilities', 'Real Estate', 'Basic Materials', 'Communication Services')
+
+
+class DataSource(ABC):
+    """
+    Everything a scan or backtest reads from the outside world. A source
+    missing any abstract method fails when it is constructed; vix() is
+    shared, built on history().
+    """
+    name = 'base'
+
+    @abstractmethod
+    def history(self, ticker, start_date, end_date):
+        """Daily OHLCV DataFrame for [start_date, end_date), indexed by date"""
+
+    @abstractmethod
+    def price_batch(self, tickers, start_date, end_date):
+        """{ticker: OHLCV DataFrame}; the download_fn of PriceStore.update"""
+
+    @abstractmethod
+    def infos(self, tickers):
+        """({ticker: .info dict}, {ticker: exception}); the fetch_many of FundamentalsCache.get_many"""
+
+    @abstractmethod
+    def universe(self, mode='medium'):
+        """Tickers to scan for a scan mode"""
+
+    def vix(self, start_date, end_date):
+        """^VIX closes as (epoch days, closes)"""
+        df = self.history('^VIX', start_date, end_date)
+        if df is None or len(df) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        close = df['Close'].dropna()
+        return to_days(close.index), close.values.astype(np.float64)
+
+    def report(self):
+        return self.name
+
+
+# =============================================================================
+# YAHOO
+# =============================================================================
+def default_universe(mode='medium'):
+    """Cached universe for a scan mode ('fast', 'medium', 'quality' or 'full'), see universe.py"""
+    from universe import load_universe
+    return load_universe(mode)
+
+
+class YahooSource(DataSource):
+    """yfinance through a FetchScheduler; universe(mode) is delegated to `universe`"""
+    name = 'yahoo'
+
+    def __init__(self, workers=8, rate=5.0, universe=None):
+        self.scheduler = FetchScheduler(max_workers=workers, rate=rate)
+        self.universe_fn = universe or default_universe
+
+    def history(self, ticker, start_date, end_date):
+        import yfinance as yf
+        df = yf.download(ticker, start=start_date, end=end_date, progress=False)
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = [col[0] for col in df.columns]
+        return df
+
+    def price_batch(self, tickers, start_date, end_date):
+        return self.scheduler.call(download_price_batch, tickers, start_date, end_date, host='yahoo')
+
+    def infos(self, tickers):
+        import yfinance as yf
+        return self.scheduler.map(lambda t: yf.Ticker(t).info, tickers, host='yahoo')
+
+    def universe(self, mode='medium'):
+        return self.universe_fn(mode)
+
+    def report(self):
+        return self.scheduler.report()
+
+
+# =============================================================================
+# LOCAL CACHE
+# =============================================================================
+class CacheSource(DataSource):
+    """Serves the local price store and fundamentals cache as they are; never downloads"""
+    name = 'cache'
+
+    def __init__(self, store_root='data/prices', fundamentals_path='data/fundamentals.json'):
+        self.store = PriceStore(store_root)
+        self.fundamentals = {}
+        if os.path.exists(fundamentals_path):
+            with open(fundamentals_path) as f:
+                self.fundamentals = {t: e['info'] for t, e in json.load(f).items()}
+
+    def history(self, ticker, start_date, end_date):
+        if ticker in BENCHMARK_TICKERS and self.store.read(ticker) is None:
+            raise ValueError(f"{ticker} is not in the price store at {self.store.root}; "
+                             f"run once with the yahoo source, which stores {', '.join(BENCHMARK_TICKERS)}")
+        return self.store.load(ticker, start_date, end_date)
+
+    def price_batch(self, tickers, start_date, end_date):
+        frames = {t: self.store.load(t, start_date, end_date) for t in tickers}
+        return {t: df for t, df in frames.items() if df is not None}
+
+    def infos(self, tickers):
+        found = {t: self.fundamentals[t] for t in tickers if t in self.fundamentals}
+        return found, {t: KeyError(t) for t in tickers if t not in found}
+
+    def universe(self, mode='medium'):
+        return sorted(t for t in self.store.index if not t.startswith('^') and t not in BENCHMARK_TICKERS)
+
+
+# =============================================================================
+# SYNTHETIC
+# =============================================================================
+class SyntheticSource(DataSource):
+    """
+    Deterministic generated market: a shared market factor (SPY), a VIX that
+    rises when the market falls, and per-ticker regime-switching prices so
+    corrections, RSI crosses and volume surges occur. Any ticker name can be
+    requested; universe() returns n_tickers names S0000, S0001, ...
+    The same seed and end_date always produce the same data.
+    """
+    name = 'synthetic'
+
+    def __init__(self, n_tickers=6000, n_bars=1500, seed=0, end_date=SYNTHETIC_END_DATE):
+        self.n_tickers = n_tickers
+        self.n_bars = n_bars
+        self.seed = seed
+        self.index = pd.bdate_range(end=pd.Timestamp(end_date) - pd.Timedelta(days=1), periods=n_bars, name='Date')
+
+        rng = self.rng('^market')
+        self.market = rng.normal(0.0004, 0.011, n_bars)
+        self.market[rng.random(n_bars) < 0.01] *= 4  # occasional shock days
+
+        # log VIX: mean-reverting around ~19, pushed up by market losses
+        log_vix = np.empty(n_bars)
+        log_vix[0] = np.log(19)
+        shocks = rng.normal(0, 0.05, n_bars) - 4 * self.market
+        for i in range(1, n_bars):
+            log_vix[i] = log_vix[i - 1] + 0.04 * (np.log(19) - log_vix[i - 1]) + shocks[i]
+        self.vix_close = np.exp(log_vix).clip(9, 85).round(2)
+
+    def rng(self, ticker):
+        return np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+
+    def bars(self, ticker):
+        """Full OHLCV arrays for one ticker on self.index"""
+        n = self.n_bars
+        if ticker == '^VIX':
+            c = self.vix_close
+            return c, c * 1.03, c * 0.97, c, np.zeros(n)
+
+        rng = self.rng(ticker)
+        if ticker == 'SPY':
+            ret, vol, base_volume = self.market, 0.011, 8e7
+        else:
+            vol = rng.uniform(0.012, 0.03)
+            regime_len = rng.integers(30, 200, n // 30 + 1)
+            drift = np.repeat(rng.normal(0.0004, 0.004, len(regime_len)), regime_len)[:n]
+            ret = rng.uniform(0.6, 1.4) * self.market + drift + rng.normal(0, vol, n)
+            base_volume = 10 ** rng.uniform(5.5, 7.5)
+
+        close = rng.uniform(10, 300) * np.exp(np.cumsum(ret))
+        spread = np.abs(rng.normal(0, vol / 2, (2, n)))
+        high, low = close * (1 + spread[0]), close * (1 - spread[1])
+        open_ = np.clip(np.r_[close[0], close[:-1]], low, high)
+        volume = base_volume * rng.lognormal(0, 0.35, n) * (1 + 8 * np.maximum(ret, 0).clip(max=0.1))
+        return open_, high, low, close, volume.round()
+
+    def history(self, ticker, start_date, end_date):
+        df = pd.DataFrame(dict(zip(COLUMNS, self.bars(ticker))), index=self.index)
+        return df[(df.index >= pd.Timestamp(start_date)) & (df.index < pd.Timestamp(end_date))]
+
+    def price_batch(self, tickers, start_date, end_date):
+        frames = {t: self.history(t, start_date, end_date) for t in tickers}
+        return {t: df for t, df in frames.items() if len(df)}
+
+    def infos(self, tickers):
+        results = {}
+        for t in tickers:
+            r = self.rng(t + '/info')
+            results[t] = {
+                'marketCap': float(10 ** r.uniform(8.5, 12)),
+                'forwardPE': float(r.uniform(5, 60)),
+                'pegRatio': float(r.uniform(0.3, 3)),
+                'priceToBook': float(r.uniform(0.5, 9)),
+                'returnOnEquity': float(r.uniform(-0.1, 0.4)),
+                'debtToEquity': float(r.uniform(5, 300)),
+                'freeCashflow': float(r.normal(2e8, 4e8)),
+                'earningsGrowth': float(r.normal(0.08, 0.2)),
+                'sector': SECTORS[r.integers(len(SECTORS))],
+            }
+        return results, {}
+
+    def universe(self, mode='medium'):
+        return [f"S{i:04d}" for i in range(self.n_tickers)]
+
+
+SOURCES = {'yahoo': YahooSource, 'cache': CacheSource, 'synthetic': SyntheticSource}
+
+
+def make_source(name, **kwargs):
+    """DataSource by name ('yahoo', 'cache' or 'synthetic')"""
+    if name not in SOURCES:
+        raise ValueError(f"Unknown data source: {name} (choose from {sorted(SOURCES)})")
+    return SOURCES[name](**kwargs)
@@ -0,0 +1,122 @@
+"""
+Exit Engine - Vectorized trade exits for a batch of entries
+Builds the forward window (entries x MAX_HOLD_DAYS) of highs/lows and finds
+the first day each exit fires using running maxima, instead of walking
+every trade forward one day at a time.
+
+Exit rules (same order as the per-day loop they replace):
+  - stop / trailing stop: low <= current stop (checked first on a day)
+  - target: high >= entry * (1 + take_profit)
+  - max_days: closed at the close MAX_HOLD_DAYS bars after entry
+  - still_open: history ends before any of the above
+"""
+
+from dataclasses import dataclass
+import numpy as np
+
+EXIT_REASONS = ('stop', 'trail_stop', 'target', 'max_days', 'still_open')
+STOP, TRAIL_STOP, TARGET, MAX_DAYS, STILL_OPEN = range(len(EXIT_REASONS))
+
+
+@dataclass
+class ExitConfig:
+    """Exit rules (defaults match the backtest)"""
+    stop_loss_pct: float = 15.0
+    take_profit_pct: float = 50.0
+    use_trailing: bool = True
+    trail_activation_pct: float = 15.0
+    trail_distance_pct: float = 10.0
+    max_hold_days: int = 120
+
+
+def simulate_exits(close, high, low, entries, cfg, entry_prices=None, batch_size=4096):
+    """
+    Exit of every trade entered at bar index `entries` (at close unless
+    entry_prices is given). Returns a dict of arrays, one value per entry:
+      exit_idx           - bar index of the exit (-1 while still open)
+      exit_day           - bars held
+      exit_price, return_pct
+      reason             - index into EXIT_REASONS
+      trailing_activated - trailing stop was active at exit
+    """
+    close = np.asarray(close, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    entries = np.asarray(entries, dtype=np.int64)
+    prices = close[entries] if entry_prices is None else np.asarray(entry_prices, dtype=np.float64)
+
+    out = {
+        'exit_idx': np.full(len(entries), -1, dtype=np.int64),
+        'exit_day': np.zeros(len(entries), dtype=np.int64),
+        'exit_price': np.zeros(len(entries)),
+        'return_pct': np.zeros(len(entries)),
+        'reason': np.zeros(len(entries), dtype=np.int8),
+        'trailing_activated': np.zeros(len(entries), dtype=bool),
+    }
+    for b in range(0, len(entries), batch_size):
+        part = slice(b, b + batch_size)
+        for key, value in _simulate_batch(close, high, low, entries[part], prices[part], cfg).items():
+            out[key][part] = value
+    return out
+
+
+def _simulate_batch(close, high, low, entries, prices, cfg):
+    n = len(close)
+    hold = cfg.max_hold_days
+    k = len(entries)
+    rows = np.arange(k)
+
+    # Forward window: column d-1 is bar entry + d
+    idx = entries[:, None] + np.arange(1, hold + 1)
+    valid = idx < n
+    idx = np.minimum(idx, n - 1)
+    day_high, day_low = high[idx], low[idx]
+
+    entry = prices[:, None]
+    stop_price = entry * (1 - cfg.stop_loss_pct / 100)
+    tp_price = entry * (1 + cfg.take_profit_pct / 100)
+    activation_price = entry * (1 + cfg.trail_activation_pct / 100)
+
+    # Highest high since entry (starting from the entry price); trailing stop
+    # only ratchets up, which the running max already guarantees
+    highest_high = np.maximum(entry, np.maximum.accumulate(day_high, axis=1))
+    if cfg.use_trailing:
+        active = np.logical_or.accumulate(day_high >= activation_price, axis=1)
+    else:
+        active = np.zeros(idx.shape, dtype=bool)
+    trailing_stop = np.maximum(stop_price, highest_high * (1 - cfg.trail_distance_pct / 100))
+    current_stop = np.where(active, trailing_stop, stop_price)
+
+    stop_hit = (day_low <= current_stop) & valid
+    exit_hit = stop_hit | ((day_high >= tp_price) & valid)
+    first = exit_hit.argmax(axis=1)
+    exited = exit_hit[rows, first]
+    by_stop = exited & stop_hit[rows, first]
+    by_target = exited & ~by_stop
+
+    # Bars available after entry; fewer than `hold` means the trade can run out of history
+    available = np.minimum(n - 1 - entries, hold)
+    open_ = ~exited & (available < hold)
+    timed_out = ~exited & ~open_
+
+    exit_day = np.where(exited, first + 1, np.where(open_, available + 1, hold))
+    exit_idx = np.where(open_, -1, entries + exit_day)
+    last = np.maximum(available - 1, 0)
+    stop_at_exit = current_stop[rows, first]
+    trailing = np.where(exited, active[rows, first], active[rows, last] & (available > 0))
+
+    exit_price = np.select([by_stop, by_target, timed_out],
+                           [stop_at_exit, tp_price[:, 0], close[np.minimum(entries + hold, n - 1)]],
+                           close[-1])
+    return_pct = np.where(by_target, cfg.take_profit_pct, (exit_price - prices) / prices * 100)
+    reason = np.select([by_stop & trailing, by_stop, by_target, timed_out],
+                       [TRAIL_STOP, STOP, TARGET, MAX_DAYS], STILL_OPEN)
+
+    return {
+        'exit_idx': exit_idx,
+        'exit_day': exit_day,
+        'exit_price': exit_price,
+        'return_pct': return_pct,
+        'reason': reason,
+        'trailing_activated': trailing,
+    }
@@ -0,0 +1,211 @@
+"""
+Fetch Engine - Bounded thread pool with adaptive rate limiting
+Runs network calls (yfinance .info, price downloads, plain HTTP) concurrently
+under a token bucket, per-host concurrency caps and retry with backoff.
+prefetch() runs one stage of a generator pipeline ahead on a background thread.
+"""
+
+import time
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def error_status(exc):
+    """HTTP status carried by an exception, if any"""
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(exc, 'status_code', None) or getattr(exc, 'code', None)
+    if isinstance(status, int):
+        return status
+    text = str(exc)
+    if '429' in text or 'Too Many Requests' in text or 'Rate limit' in text:
+        return 429
+    return None
+
+
+def host_of(url):
+    return urlparse(url).netloc
+
+
+class TokenBucket:
+    """Thread-safe token bucket; rate backs off on 429 and recovers on success"""
+
+    def __init__(self, rate, burst=None, min_rate=0.2):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min_rate
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self):
+        """Multiplicative decrease after a rate-limit response"""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+
+    def recover(self):
+        """Additive increase back towards the configured rate"""
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class FetchScheduler:
+    """
+    Run fn(item) for many items on a bounded pool.
+
+    rate        - requests/second across all workers (token bucket)
+    host_limits - {host: max concurrent requests}; items are mapped to a host
+                  by the `host` argument of map() (a string or item -> host)
+    """
+
+    def __init__(self, max_workers=8, rate=5.0, burst=None, host_limits=None,
+                 max_retries=4, backoff=1.0, max_backoff=60.0):
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate, burst)
+        self.host_limits = host_limits or {}
+        self.host_slots = {}
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'failed': 0, 'seconds': 0.0}
+
+    def slot(self, host):
+        with self.lock:
+            if host not in self.host_slots:
+                limit = self.host_limits.get(host, self.max_workers)
+                self.host_slots[host] = threading.BoundedSemaphore(limit)
+            return self.host_slots[host]
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def call(self, fn, *args, host=None, **kwargs):
+        """Rate-limited call with retry on 429/5xx"""
+        with self.slot(host):
+            for attempt in range(self.max_retries + 1):
+                self.bucket.acquire()
+                self.count('requests')
+                try:
+                    result = fn(*args, **kwargs)
+                    self.bucket.recover()
+                    return result
+                except Exception as e:
+                    status = error_status(e)
+                    if status not in RETRY_STATUS or attempt == self.max_retries:
+                        raise
+                    if status == 429:
+                        self.count('throttled')
+                        self.bucket.throttle()
+                    self.count('retries')
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                    time.sleep(delay * (0.5 + random.random()))
+
+    def map(self, fn, items, host=None):
+        """Returns ({item: result}, {item: exception})"""
+        results, errors = {}, {}
+        items = list(items)
+        if not items:
+            return results, errors
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {}
+            for item in items:
+                item_host = host(item) if callable(host) else host
+                futures[pool.submit(self.call, fn, item, host=item_host)] = item
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    results[item] = future.result()
+                except Exception as e:
+                    errors[item] = e
+                    self.count('failed')
+        self.count('seconds', time.time() - start)
+        return results, errors
+
+    def requests_per_second(self):
+        return self.stats['requests'] / self.stats['seconds'] if self.stats['seconds'] else 0.0
+
+    def report(self):
+        s = self.stats
+        return (f"{s['requests']} requests in {s['seconds']:.1f}s ({self.requests_per_second():.1f}/s), "
+                f"{s['retries']} retries, {s['throttled']} throttled, {s['failed']} failed, "
+                f"rate now {self.bucket.rate:.1f}/s")
+
+
+# =============================================================================
+# STREAMING
+# =============================================================================
+def prefetch(items, depth=2):
+    """
+    Iterate `items` on a background thread, at most `depth` items ahead of the
+    consumer (a bounded queue), so e.g. the next download overlaps the current
+    computation. Exceptions are re-raised in the consumer.
+    """
+    q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    end = object()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                q.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except BaseException as e:
+            put((end, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = q.get()
+            if error is not None:
+                raise error
+            if item is end:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def batched(items, size):
+    """Lists of up to `size` consecutive items from any iterable"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
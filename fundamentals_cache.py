@@ -0,0 +1,83 @@
+"""
+Fundamentals Cache - Projected yfinance .info fields with TTL
+Only the fields the screener reads are stored. Expiry is staggered per
+ticker and refreshes can be capped per run, so a daily job only re-fetches
+a slice of the universe.
+"""
+
+import os
+import json
+import time
+import zlib
+
+FIELDS = (
+    'forwardPE', 'trailingPE', 'pegRatio', 'priceToBook', 'returnOnEquity',
+    'debtToEquity', 'freeCashflow', 'earningsGrowth', 'marketCap', 'sector',
+)
+
+DAY_SECONDS = 86400
+
+
+def project(info):
+    return {f: info.get(f) for f in FIELDS}
+
+
+class FundamentalsCache:
+    """
+    ttl_days    - nominal lifetime; each ticker gets a fixed TTL between
+                  0.5x and 1.5x of it so refreshes spread across days
+    max_refresh - cap on expired entries re-fetched per run across all
+                  get_many() calls (oldest first); the rest are served stale
+                  until a later run. Tickers never fetched are always fetched.
+    """
+
+    def __init__(self, path='data/fundamentals.json', ttl_days=7, max_refresh=None):
+        self.path = path
+        self.ttl_days = ttl_days
+        self.refresh_budget = max_refresh
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+        self.stats = {'hits': 0, 'fetched': 0, 'refreshed': 0, 'stale': 0, 'failed': 0}
+
+    def ttl(self, ticker):
+        jitter = (zlib.crc32(ticker.encode()) % 1000) / 1000
+        return self.ttl_days * DAY_SECONDS * (0.5 + jitter)
+
+    def expired(self, ticker, now):
+        entry = self.entries.get(ticker)
+        return entry is None or now - entry['fetched_at'] > self.ttl(ticker)
+
+    def get_many(self, tickers, fetch_many):
+        """
+        {ticker: projected info} for every ticker that has data.
+        fetch_many(tickers) -> ({ticker: info}, {ticker: error})
+        """
+        now = time.time()
+        missing = [t for t in tickers if t not in self.entries]
+        expired = [t for t in tickers if t in self.entries and self.expired(t, now)]
+        expired.sort(key=lambda t: self.entries[t]['fetched_at'])
+        if self.refresh_budget is not None:
+            self.stats['stale'] += max(0, len(expired) - self.refresh_budget)
+            expired = expired[:self.refresh_budget]
+            self.refresh_budget -= len(expired)
+        self.stats['hits'] += len(tickers) - len(missing) - len(expired)
+        refreshing = set(expired)
+
+        to_fetch = missing + expired
+        if to_fetch:
+            results, errors = fetch_many(to_fetch)
+            self.stats['failed'] += len(errors)
+            for ticker, info in results.items():
+                self.entries[ticker] = {'fetched_at': now, 'info': project(info or {})}
+                self.stats['refreshed' if ticker in refreshing else 'fetched'] += 1
+
+        return {t: self.entries[t]['info'] for t in tickers if t in self.entries}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
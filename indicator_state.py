@@ -0,0 +1,270 @@
+"""
+Indicator State - Streaming updates of the strategy indicators
+Keeps the Wilder EWM accumulators, rolling sums/windows and a monotonic
+deque for the 52-week high per ticker, so a daily run only feeds in the
+new bar(s) instead of recomputing the whole history.
+
+Updates follow the same arithmetic as pandas' ewm(adjust=False) and
+rolling().mean()/max(), so values match indicators.compute_indicators()
+run over the same bars.
+"""
+
+import os
+import math
+import pickle
+import numpy as np
+
+LENGTH = 14
+SMA_DAYS = 200
+HIGH_DAYS = 252
+
+# Columns kept for the most recent bars (what the signal mask needs)
+TAIL_FIELDS = ('day', 'close', 'volume', 'rsi', 'adx', 'sma_200', 'sma_slope', 'high_52w', 'vol_avg')
+
+NAN = float('nan')
+
+
+def ewm_alpha(alpha):
+    """Alpha as pandas uses it internally (round-tripped through center of mass)"""
+    com = (1 - alpha) / alpha
+    return 1.0 / (1.0 + com)
+
+
+ALPHA = ewm_alpha(1 / LENGTH)
+
+
+def ewm_new():
+    return {'mean': NAN, 'old_wt': 1.0, 'nobs': 0}
+
+
+def ewm_update(s, x, minp=LENGTH, alpha=ALPHA):
+    """One step of ewm(alpha, adjust=False, ignore_na=False).mean()"""
+    observed = not math.isnan(x)
+    s['nobs'] += observed
+    if s['mean'] == s['mean']:
+        s['old_wt'] *= 1 - alpha
+        if observed:
+            if s['mean'] != x:
+                s['mean'] = (s['old_wt'] * s['mean'] + alpha * x) / (s['old_wt'] + alpha)
+            s['old_wt'] = 1.0
+    elif observed:
+        s['mean'] = x
+    return s['mean'] if s['nobs'] >= minp else NAN
+
+
+def kahan_add(s, key, x):
+    y = x - s[key]
+    t = s['sum'] + y
+    s[key] = t - s['sum'] - y
+    s['sum'] = t
+
+
+def rolling_mean_new(window):
+    return {'window': window, 'values': [], 'sum': 0.0, 'comp_add': 0.0, 'comp_remove': 0.0,
+            'neg': 0, 'same': 0, 'prev': NAN}
+
+
+def rolling_mean_update(s, x):
+    """One step of rolling(window).mean() (values assumed non-NaN)"""
+    values = s['values']
+    if len(values) == s['window']:
+        old = values.pop(0)
+        kahan_add(s, 'comp_remove', -old)
+        s['neg'] -= math.copysign(1, old) < 0
+    values.append(x)
+    kahan_add(s, 'comp_add', x)
+    s['neg'] += math.copysign(1, x) < 0
+    s['same'] = s['same'] + 1 if x == s['prev'] else 1
+    s['prev'] = x
+
+    n = len(values)
+    if n < s['window']:
+        return NAN
+    mean = s['sum'] / n
+    if s['same'] >= n:
+        return s['prev']
+    if s['neg'] == 0 and mean < 0:
+        return 0.0
+    if s['neg'] == n and mean > 0:
+        return 0.0
+    return mean
+
+
+class IndicatorState:
+    """Per-ticker indicator accumulators plus the last `tail_size` indicator rows"""
+
+    def __init__(self, sma_slope_days=20, volume_avg_days=50, tail_size=40):
+        self.sma_slope_days = sma_slope_days
+        self.tail_size = tail_size
+        self.day = None
+        self.bars = 0
+        self.prev = None  # last (high, low, close)
+        self.gain = ewm_new()
+        self.loss = ewm_new()
+        self.tr = ewm_new()
+        self.plus_dm = ewm_new()
+        self.minus_dm = ewm_new()
+        self.dx = ewm_new()
+        self.sma = rolling_mean_new(SMA_DAYS)
+        self.sma_hist = []    # last sma_slope_days + 1 SMA200 values
+        self.highs = []       # monotonic deque of [bar, high] for the 252-bar max
+        self.vol = rolling_mean_new(volume_avg_days)
+        self.tail = {f: [] for f in TAIL_FIELDS}
+
+    def update(self, day, high, low, close, volume):
+        """Feed one bar; returns the indicator row for that bar"""
+        bar = self.bars
+        if self.prev is None:
+            delta = NAN
+            tr = high - low
+            up = down = NAN
+        else:
+            p_high, p_low, p_close = self.prev
+            delta = close - p_close
+            tr = float(np.fmax(np.fmax(high - low, abs(high - p_close)), abs(low - p_close)))
+            up = high - p_high
+            down = p_low - low
+
+        # RSI
+        avg_gain = ewm_update(self.gain, delta if delta > 0 else 0.0)
+        avg_loss = ewm_update(self.loss, -delta if delta < 0 else 0.0)
+        rs = avg_gain / avg_loss if avg_loss != 0 else NAN
+        rsi = 100.0 - (100.0 / (1.0 + rs))
+        rsi = 50.0 if rsi != rsi else rsi
+
+        # ADX
+        atr = ewm_update(self.tr, tr)
+        plus = ewm_update(self.plus_dm, up if (up > down and up > 0) else 0.0)
+        minus = ewm_update(self.minus_dm, down if (down > up and down > 0) else 0.0)
+        atr = atr if atr != 0 else NAN
+        plus_di = 100 * plus / atr
+        minus_di = 100 * minus / atr
+        di_sum = plus_di + minus_di
+        dx = 100 * abs(plus_di - minus_di) / (di_sum if di_sum != 0 else NAN)
+        adx = ewm_update(self.dx, dx)
+        adx = 0.0 if adx != adx else adx
+
+        # SMA200 and its slope
+        sma = rolling_mean_update(self.sma, close)
+        self.sma_hist.append(sma)
+        if len(self.sma_hist) > self.sma_slope_days + 1:
+            self.sma_hist.pop(0)
+        if len(self.sma_hist) > self.sma_slope_days:
+            past = self.sma_hist[0]
+            slope = (sma - past) / past * 100
+        else:
+            slope = NAN
+
+        # 52-week high (monotonic deque of candidate maxima)
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append([bar, high])
+        while self.highs[0][0] <= bar - HIGH_DAYS:
+            self.highs.pop(0)
+        high_52w = self.highs[0][1] if bar + 1 >= HIGH_DAYS else NAN
+
+        vol_avg = rolling_mean_update(self.vol, volume)
+
+        self.prev = (high, low, close)
+        self.day = int(day)
+        self.bars += 1
+
+        row = dict(zip(TAIL_FIELDS, (int(day), close, volume, rsi, adx, sma, slope, high_52w, vol_avg)))
+        for f in TAIL_FIELDS:
+            self.tail[f].append(row[f])
+            if len(self.tail[f]) > self.tail_size:
+                self.tail[f].pop(0)
+        return row
+
+    def update_records(self, rec):
+        """Feed a PRICE_DTYPE record array"""
+        for r in rec:
+            self.update(r['day'], float(r['high']), float(r['low']), float(r['close']), float(r['volume']))
+
+    def tail_arrays(self):
+        """Recent indicator rows as arrays plus the bar number of the first row"""
+        arrays = {f: np.array(self.tail[f], dtype=np.int64 if f == 'day' else np.float64) for f in TAIL_FIELDS}
+        return arrays, self.bars - len(self.tail['day'])
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls.__new__(cls)
+        state.__dict__.update(d)
+        if state.prev is not None:
+            state.prev = tuple(state.prev)
+        return state
+
+
+class IndicatorStateStore:
+    """
+    One pickled IndicatorState per ticker under `root`. A state is read the
+    first time its ticker is advanced and save() rewrites only the tickers
+    advanced since the last save, so a daily run costs O(tickers touched).
+    save() also drops every loaded state from memory (they are all on disk
+    then), so saving per batch keeps memory flat whatever the universe size.
+    """
+
+    def __init__(self, root='data/indicator_state', **state_kwargs):
+        self.root = root
+        self.state_kwargs = state_kwargs
+        self.states = {}
+        self.dirty = set()
+
+    def path(self, ticker):
+        return os.path.join(self.root, f"{ticker}.pkl")
+
+    def get(self, ticker):
+        """Stored state dict or None; an unreadable file counts as no state"""
+        if ticker not in self.states:
+            self.states[ticker] = None
+            path = self.path(ticker)
+            if os.path.exists(path):
+                try:
+                    with open(path, 'rb') as f:
+                        self.states[ticker] = pickle.load(f)
+                except (pickle.UnpicklingError, EOFError, ValueError):
+                    pass
+        return self.states[ticker]
+
+    def put(self, ticker, state):
+        self.states[ticker] = state.to_dict()
+        self.dirty.add(ticker)
+
+    def advance(self, ticker, rec, atol=1e-9):
+        """
+        Bring a ticker's state up to the last bar of its price records.
+        Rebuilds from the full history when there is no state or the stored
+        bars no longer match it (history re-adjusted after a split/dividend).
+        Returns (state, bars_applied).
+        """
+        d = self.get(ticker)
+        state = IndicatorState.from_dict(d) if d else None
+
+        if state is not None and state.day is not None:
+            pos = np.searchsorted(rec['day'], state.day)
+            if pos < len(rec) and rec['day'][pos] == state.day and \
+                    math.isclose(rec['close'][pos], state.prev[2], rel_tol=0, abs_tol=atol):
+                new = rec[pos + 1:]
+                if len(new):
+                    state.update_records(new)
+                    self.put(ticker, state)
+                return state, len(new)
+
+        state = IndicatorState(**self.state_kwargs)
+        state.update_records(rec)
+        self.put(ticker, state)
+        return state, len(rec)
+
+    def save(self):
+        """Write the states changed since the last save, then evict all loaded states"""
+        os.makedirs(self.root, exist_ok=True)
+        for ticker in self.dirty:
+            tmp = self.path(ticker) + '.tmp'
+            with open(tmp, 'wb') as f:
+                pickle.dump(self.states[ticker], f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path(ticker))
+        self.dirty.clear()
+        self.states.clear()
@@ -0,0 +1,66 @@
+"""
+Indicators - RSI, ADX/DI, SMA200 + slope, 52-week high, volume average
+Every function accepts a Series (one ticker) or a DataFrame of aligned
+dates x tickers and computes all columns in one vectorized pass.
+
+Panel columns may start with NaN rows (tickers listed after the first date);
+those give the same values as running the ticker on its own history.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def calc_rsi(close, length=14):
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0.0).where(close.notna())
+    loss = (-delta).where(delta < 0, 0.0).where(close.notna())
+    avg_gain = gain.ewm(alpha=1/length, min_periods=length, adjust=False).mean()
+    avg_loss = loss.ewm(alpha=1/length, min_periods=length, adjust=False).mean()
+    rs = avg_gain / avg_loss.replace(0, np.nan)
+    return (100.0 - (100.0 / (1.0 + rs))).fillna(50)
+
+
+def calc_adx(high, low, close, length=14):
+    prev_close = close.shift(1)
+    tr = np.fmax(np.fmax(high - low, (high - prev_close).abs()), (low - prev_close).abs())
+    up_move = high - high.shift(1)
+    down_move = low.shift(1) - low
+    listed = close.notna()
+    plus_dm = up_move.where((up_move > down_move) & (up_move > 0), 0.0).where(listed)
+    minus_dm = down_move.where((down_move > up_move) & (down_move > 0), 0.0).where(listed)
+    atr = tr.ewm(alpha=1/length, min_periods=length, adjust=False).mean()
+    plus_di = 100 * plus_dm.ewm(alpha=1/length, min_periods=length, adjust=False).mean() / atr.replace(0, np.nan)
+    minus_di = 100 * minus_dm.ewm(alpha=1/length, min_periods=length, adjust=False).mean() / atr.replace(0, np.nan)
+    dx = 100 * (plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, np.nan)
+    adx = dx.ewm(alpha=1/length, min_periods=length, adjust=False).mean()
+    return adx.fillna(0), plus_di.fillna(0), minus_di.fillna(0)
+
+
+def calc_sma_slope(sma, days=20):
+    """Percent change of the SMA over `days` bars"""
+    return (sma - sma.shift(days)) / sma.shift(days) * 100
+
+
+def compute_indicators(close, high, low, volume, sma_slope_days=20, volume_avg_days=50):
+    """All strategy indicators for a Series or a dates x tickers DataFrame"""
+    rsi = calc_rsi(close, 14)
+    adx, plus_di, minus_di = calc_adx(high, low, close, 14)
+    sma_200 = close.rolling(200).mean()
+    return {
+        'rsi': rsi,
+        'adx': adx,
+        'plus_di': plus_di,
+        'minus_di': minus_di,
+        'sma_200': sma_200,
+        'sma_slope': calc_sma_slope(sma_200, sma_slope_days),
+        'high_52w': high.rolling(252).max(),
+        'vol_avg': volume.rolling(volume_avg_days).mean(),
+    }
+
+
+def build_panel(frames, columns=('Open', 'High', 'Low', 'Close', 'Volume')):
+    """{ticker: OHLCV DataFrame} -> {column: dates x tickers DataFrame} on the union calendar"""
+    tickers = list(frames)
+    return {col: pd.concat([frames[t][col] for t in tickers], axis=1, keys=tickers).sort_index()
+            for col in columns}
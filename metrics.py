@@ -0,0 +1,135 @@
+"""
+Metrics - Daily mark-to-market equity and risk statistics
+Trades become a dates x tickers matrix of shares held (one scatter-add per
+entry/exit and a cumulative sum), so daily P&L, equity, exposure,
+drawdown, Sharpe/Sortino and beta are a handful of array operations.
+risk_metrics() also takes a stack of equity curves (one row per sweep
+combination) and scores them all at once.
+"""
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+
+def mark_to_market(close, entry_row, exit_row, shares, entry_price, exit_price, col=None):
+    """
+    Daily P&L and shares held for trades on a close panel (dates x tickers,
+    or 1-D for a single ticker). Trades enter at entry_price on entry_row
+    and leave at exit_price on exit_row (-1 while still open).
+    Returns (pnl, held) shaped like close.
+    """
+    panel = close.reshape(len(close), -1)
+    n = len(panel)
+    col = np.zeros(len(entry_row), dtype=np.int64) if col is None else col
+    closed = exit_row >= 0
+
+    delta = np.zeros((n + 1, panel.shape[1]))
+    np.add.at(delta, (entry_row, col), shares)
+    np.add.at(delta, (np.where(closed, exit_row, n), col), -shares)
+    held = np.cumsum(delta[:-1], axis=0)
+
+    # Overnight moves of positions held at the previous close, then the
+    # entry/exit fills relative to that day's close
+    pnl = np.zeros(panel.shape)
+    prev = held[:-1]
+    with np.errstate(invalid='ignore'):
+        pnl[1:] = np.where(prev != 0, prev * (panel[1:] - panel[:-1]), 0.0)
+    np.add.at(pnl, (entry_row, col), shares * (panel[entry_row, col] - entry_price))
+    np.add.at(pnl, (exit_row[closed], col[closed]),
+              shares[closed] * (exit_price[closed] - panel[exit_row[closed], col[closed]]))
+    return pnl.reshape(close.shape), held.reshape(close.shape)
+
+
+def close_panel(closes, tickers, calendar):
+    """{ticker: (days, close)} -> dates x tickers closes on `calendar`, forward-filled"""
+    calendar = np.asarray(calendar)
+    panel = np.full((len(calendar), len(tickers)), np.nan)
+    for j, ticker in enumerate(tickers):
+        days, close = closes[ticker]
+        rows = np.searchsorted(calendar, days)
+        ok = rows < len(calendar)
+        ok[ok] = calendar[rows[ok]] == np.asarray(days)[ok]
+        panel[rows[ok], j] = np.asarray(close)[ok]
+    return pd.DataFrame(panel).ffill().values
+
+
+def daily_equity(trades, closes, calendar, capital=100000):
+    """
+    Daily mark-to-market equity of backtest trades (dicts with ticker,
+    entry_date, entry_price, exit_date (None/-1 while open), exit_price and
+    position in dollars). Returns a DataFrame indexed by date with pnl,
+    equity, gross (value of open positions), exposure (gross / equity) and
+    positions (open trades).
+    """
+    calendar = np.asarray(calendar)
+    tickers = sorted({t['ticker'] for t in trades})
+    col_of = {t: j for j, t in enumerate(tickers)}
+    panel = close_panel(closes, tickers, calendar)
+
+    col = np.array([col_of[t['ticker']] for t in trades], dtype=np.int64)
+    entry_price = np.array([t['entry_price'] for t in trades], dtype=np.float64)
+    exit_price = np.array([t['exit_price'] for t in trades], dtype=np.float64)
+    shares = np.array([t['position'] for t in trades], dtype=np.float64) / entry_price
+    entry_row = np.searchsorted(calendar, [t['entry_date'] for t in trades]).astype(np.int64)
+    exit_day = np.array([-1 if t['exit_date'] is None else t['exit_date'] for t in trades], dtype=np.int64)
+    exit_row = np.where(exit_day >= 0, np.searchsorted(calendar, exit_day), -1)
+
+    # Trades entered after the last calendar day are ignored
+    keep = entry_row < len(calendar)
+    exit_row = np.minimum(exit_row, len(calendar) - 1)
+    pnl, held = mark_to_market(panel, entry_row[keep], exit_row[keep], shares[keep],
+                               entry_price[keep], exit_price[keep], col[keep])
+
+    count = np.zeros(len(calendar) + 1, dtype=np.int64)
+    np.add.at(count, entry_row[keep], 1)
+    np.add.at(count, np.where(exit_row[keep] >= 0, exit_row[keep], len(calendar)), -1)
+
+    daily_pnl = pnl.sum(axis=1)
+    equity = capital + np.cumsum(daily_pnl)
+    gross = np.nansum(np.where(held != 0, held * panel, 0.0), axis=1)
+    return pd.DataFrame({
+        'pnl': daily_pnl,
+        'equity': equity,
+        'gross': gross,
+        'exposure': gross / equity,
+        'positions': np.cumsum(count[:-1]),
+    }, index=pd.DatetimeIndex(calendar.astype('datetime64[D]'), name='Date'))
+
+
+def risk_metrics(equity, benchmark=None, exposure=None, periods=TRADING_DAYS):
+    """
+    Return, CAGR, max drawdown, Sharpe, Sortino, beta (vs benchmark prices on
+    the same dates) and average exposure for an equity curve, or for each
+    row of a 2-D stack of curves (values are then arrays).
+    """
+    eq = np.asarray(equity, dtype=np.float64)
+    single = eq.ndim == 1
+    eq = np.atleast_2d(eq)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = eq[:, 1:] / eq[:, :-1] - 1
+        mean, std = r.mean(axis=1), r.std(axis=1, ddof=1)
+        downside = np.sqrt((np.minimum(r, 0) ** 2).mean(axis=1))
+        years = r.shape[1] / periods
+        out = {
+            'total_return_pct': (eq[:, -1] / eq[:, 0] - 1) * 100,
+            'cagr_pct': ((eq[:, -1] / eq[:, 0]) ** (1 / years) - 1) * 100 if years else np.full(len(eq), np.nan),
+            'max_drawdown_pct': (eq / np.maximum.accumulate(eq, axis=1) - 1).min(axis=1) * 100,
+            'sharpe': np.where(std > 0, mean / std * np.sqrt(periods), np.nan),
+            'sortino': np.where(downside > 0, mean / downside * np.sqrt(periods), np.nan),
+        }
+        if benchmark is not None:
+            b = np.asarray(benchmark, dtype=np.float64)
+            br = b[1:] / b[:-1] - 1
+            br_c = br - br.mean()
+            out['beta'] = ((r - mean[:, None]) * br_c).sum(axis=1) / (br_c ** 2).sum()
+        if exposure is not None:
+            x = np.atleast_2d(np.asarray(exposure, dtype=np.float64))
+            out['avg_exposure_pct'] = x.mean(axis=1) * 100
+            out['time_in_market_pct'] = (x > 0).mean(axis=1) * 100
+
+    if single:
+        return {k: float(v[0]) for k, v in out.items()}
+    return out
@@ -0,0 +1,88 @@
+"""
+Portfolio - Event-driven simulation of backtest trades under capital limits
+Walks one merged timeline of entries and exits across all tickers (a heap
+ordered by day, exits before entries), so a trade is only taken if a slot
+and the cash for it exist. Positions are sized from current mark-to-market
+equity, and equity is marked daily from stored closes.
+
+Trades come from the backtest as dicts with ticker, entry_date, entry_price,
+exit_date (None or -1 while open) and exit_price; dates are epoch days.
+"""
+
+import heapq
+import numpy as np
+import pandas as pd
+
+EXIT, ENTRY = 0, 1  # same-day order: exits free cash before new entries
+
+
+def simulate_portfolio(trades, closes, capital=100000, risk_pct=1.0, stop_loss_pct=15.0,
+                       max_position_pct=15.0, max_open=20, calendar=None):
+    """
+    trades  - candidate trades (see module docstring), taken in list order on ties
+    closes  - {ticker: (days, close)} daily closes used to mark open positions
+    Returns (daily equity DataFrame, taken trades DataFrame, stats dict).
+    """
+    if calendar is None:
+        tickers = {tr['ticker'] for tr in trades}
+        calendar = np.unique(np.concatenate([np.asarray(closes[t][0]) for t in tickers])) if tickers \
+            else np.empty(0, dtype=np.int64)
+
+    events = [(tr['entry_date'], ENTRY, n) for n, tr in enumerate(trades)]
+    heapq.heapify(events)
+
+    cash = float(capital)
+    open_positions = {}  # trade number -> (shares, days, close)
+    taken = []
+    stats = {'candidates': len(trades), 'taken': 0, 'skipped_max_open': 0, 'skipped_cash': 0, 'max_open': 0}
+    equity_rows = np.zeros((len(calendar), 4))
+
+    def positions_value(day):
+        value = 0.0
+        for shares, days, close in open_positions.values():
+            i = np.searchsorted(days, day, 'right') - 1
+            value += shares * close[max(i, 0)]
+        return value
+
+    for k, day in enumerate(calendar):
+        equity = None
+        while events and events[0][0] <= day:
+            _, kind, n = heapq.heappop(events)
+            tr = trades[n]
+            if kind == EXIT:
+                shares = open_positions.pop(n)[0]
+                cash += shares * tr['exit_price']
+                continue
+
+            if len(open_positions) >= max_open:
+                stats['skipped_max_open'] += 1
+                continue
+            if equity is None:
+                equity = cash + positions_value(day)
+            size = min(equity * risk_pct / 100 / (stop_loss_pct / 100), equity * max_position_pct / 100, cash)
+            if size < tr['entry_price']:
+                stats['skipped_cash'] += 1
+                continue
+
+            shares = size / tr['entry_price']
+            cash -= size
+            days, close = closes[tr['ticker']]
+            open_positions[n] = (shares, np.asarray(days), np.asarray(close))
+            exit_date = tr.get('exit_date')
+            if exit_date is not None and exit_date >= 0:
+                heapq.heappush(events, (exit_date, EXIT, n))
+            taken.append({**tr, 'shares': shares, 'cost': size,
+                          'portfolio_pnl': shares * (tr['exit_price'] - tr['entry_price'])})
+            stats['taken'] += 1
+            stats['max_open'] = max(stats['max_open'], len(open_positions))
+
+        value = positions_value(day)
+        equity_rows[k] = (cash, value, cash + value, len(open_positions))
+
+    equity = pd.DataFrame(equity_rows, columns=['cash', 'positions', 'equity', 'open_positions'],
+                          index=pd.DatetimeIndex(np.asarray(calendar, dtype='datetime64[D]'), name='Date'))
+    equity['open_positions'] = equity['open_positions'].astype(int)
+    final = equity['equity'].iloc[-1] if len(equity) else float(capital)
+    stats['final_equity'] = float(final)
+    stats['return_pct'] = (final - capital) / capital * 100
+    return equity, pd.DataFrame(taken), stats
@@ -0,0 +1,202 @@
+"""
+Price Store - Local OHLCV history with incremental daily append
+One memory-mappable .npy record array per ticker, keyed by epoch day.
+Only the missing tail bars are downloaded on each run.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from calendar_index import to_day, from_day, to_days
+
+PRICE_DTYPE = np.dtype([
+    ('day', 'i8'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+])
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Benchmark/regime series every update keeps current alongside the requested
+# tickers, so a store filled by a yahoo run can later serve --source cache
+BENCHMARK_TICKERS = ('SPY', '^VIX')
+
+# Relative difference on the overlap bar that means history was re-adjusted
+# (split/dividend) and the whole series must be downloaded again
+ADJUSTMENT_RTOL = 1e-4
+
+
+def download_price_batch(tickers, start_date, end_date):
+    """Download OHLCV for a chunk of tickers in one request, split per ticker"""
+    import yfinance as yf
+    data = yf.download(tickers, start=start_date, end=end_date, group_by='ticker',
+                       threads=True, progress=False)
+    frames = {}
+    if data is None or len(data) == 0:
+        return frames
+
+    if not isinstance(data.columns, pd.MultiIndex):
+        # Single-ticker responses come back with flat columns
+        if len(tickers) == 1:
+            frames[tickers[0]] = data.dropna(how='all')
+        return frames
+
+    available = set(data.columns.get_level_values(0))
+    for ticker in tickers:
+        if ticker not in available:
+            continue
+        df = data[ticker].dropna(how='all')
+        if len(df) > 0:
+            frames[ticker] = df
+    return frames
+
+
+def frame_to_records(df):
+    """OHLCV DataFrame -> PRICE_DTYPE record array (rows with no close dropped)"""
+    df = df.dropna(subset=['Close'])
+    rec = np.empty(len(df), dtype=PRICE_DTYPE)
+    rec['day'] = to_days(df.index)
+    for col in COLUMNS:
+        rec[col.lower()] = df[col].values.astype(np.float64)
+    return rec
+
+
+def records_to_frame(rec):
+    """PRICE_DTYPE record array -> OHLCV DataFrame indexed by date"""
+    index = pd.DatetimeIndex(rec['day'].astype('datetime64[D]'), name='Date')
+    return pd.DataFrame({col: np.array(rec[col.lower()]) for col in COLUMNS}, index=index)
+
+
+class PriceStore:
+    """Per-ticker OHLCV arrays on disk with an index of covered ranges"""
+
+    def __init__(self, root='data/prices'):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, 'index.json')
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    def path(self, ticker):
+        return os.path.join(self.root, f"{ticker}.npy")
+
+    def save_index(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_path)
+
+    def read(self, ticker):
+        """Raw record array (memory-mapped) or None"""
+        path = self.path(ticker)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def write(self, ticker, rec):
+        tmp = self.path(ticker) + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, rec)
+        os.replace(tmp, self.path(ticker))
+
+    def load(self, ticker, start_date=None, end_date=None):
+        """OHLCV DataFrame for [start_date, end_date) or None if not stored"""
+        rec = self.read(ticker)
+        if rec is None or len(rec) == 0:
+            return None
+        lo = 0 if start_date is None else np.searchsorted(rec['day'], to_day(start_date), 'left')
+        hi = len(rec) if end_date is None else np.searchsorted(rec['day'], to_day(end_date), 'left')
+        if hi <= lo:
+            return None
+        return records_to_frame(rec[lo:hi])
+
+    def merge(self, ticker, df, replace=False):
+        """Write downloaded bars; returns False if the overlap bar no longer matches"""
+        new = frame_to_records(df)
+        old = None if replace else self.read(ticker)
+        if old is None or len(old) == 0:
+            self.write(ticker, new)
+            return True
+        if len(new) == 0:
+            return True
+
+        # First downloaded bar overlaps the last stored bar: if the close moved,
+        # the provider re-adjusted history and the stored series is stale
+        overlap = np.searchsorted(old['day'], new['day'][0], 'left')
+        if overlap < len(old) and old['day'][overlap] == new['day'][0]:
+            if not np.isclose(old['close'][overlap], new['close'][0], rtol=ADJUSTMENT_RTOL):
+                return False
+
+        self.write(ticker, np.concatenate([np.array(old[:overlap]), new]))
+        return True
+
+    def update(self, tickers, start_date, end_date, download_fn=download_price_batch, batch_size=100,
+               benchmarks=True):
+        """Bring every ticker (plus BENCHMARK_TICKERS) up to date, downloading only missing tail bars"""
+        if benchmarks:
+            tickers = list(tickers) + [t for t in BENCHMARK_TICKERS if t not in tickers]
+        today = to_day(datetime.now())
+        start_day = to_day(start_date)
+        stats = {'cached': 0, 'appended': 0, 'full': 0, 'empty': 0}
+
+        # Group tickers by the date their download has to start from so each
+        # group can still go out as multi-ticker batches
+        groups = {}
+        for ticker in tickers:
+            meta = self.index.get(ticker)
+            rec = self.read(ticker)
+            if meta and meta.get('checked') == today and meta['from'] <= start_day:
+                stats['cached'] += 1
+                continue
+            if meta is None or rec is None or len(rec) == 0 or meta['from'] > start_day:
+                groups.setdefault(None, []).append(ticker)
+            else:
+                # Re-fetch the last stored bar to detect re-adjusted history
+                groups.setdefault(from_day(rec['day'][-1]), []).append(ticker)
+
+        for fetch_start, group in groups.items():
+            full = fetch_start is None
+            for b in range(0, len(group), batch_size):
+                batch = group[b:b + batch_size]
+                frames = download_fn(batch, fetch_start or start_date, end_date)
+
+                stale, retry = [], set()
+                for ticker in batch:
+                    df = frames.get(ticker)
+                    if df is None or len(df) == 0:
+                        stats['empty'] += 1
+                    elif self.merge(ticker, df, replace=full):
+                        stats['full' if full else 'appended'] += 1
+                    else:
+                        stale.append(ticker)
+
+                if stale:
+                    frames = download_fn(stale, start_date, end_date)
+                    for ticker in stale:
+                        df = frames.get(ticker)
+                        if df is not None and len(df) > 0:
+                            self.merge(ticker, df, replace=True)
+                            stats['full'] += 1
+                        else:
+                            # Keep the stale history unstamped so the next run retries it
+                            stats['empty'] += 1
+                            retry.add(ticker)
+
+                for ticker in batch:
+                    if ticker in retry:
+                        continue
+                    meta = self.index.get(ticker, {'from': start_day})
+                    if full or ticker in stale:
+                        meta['from'] = start_day
+                    meta['checked'] = today
+                    self.index[ticker] = meta
+
+            self.save_index()
+
+        return stats
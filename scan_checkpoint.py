@@ -0,0 +1,132 @@
+"""
+Scan Checkpoint - Resume a day's scan and split it into shards
+A checkpoint is a small JSON file per (day, shard): the tickers already fully
+processed and the running counts. The worker flushes its signal writer and
+saves its caches before each checkpoint, so a run that is cut off (Actions
+timeout, crash) resumes with only the unfinished tickers. Shards split the
+universe by a stable hash of the ticker, so each parallel job keeps seeing
+the same tickers (and its own price cache) from day to day.
+"""
+
+import os
+import json
+import time
+import zlib
+
+# Counts summed across resumed attempts and across shards
+COUNTERS = ('success', 'skipped', 'error', 'signals', 'inserted', 'failed', 'seconds')
+
+
+def parse_shard(text):
+    """'k/N' -> (k, N) with 1 <= k <= N"""
+    try:
+        k, n = (int(x) for x in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like k/N, got {text!r}")
+    if not 1 <= k <= n:
+        raise ValueError(f"Shard {k}/{n} is out of range")
+    return k, n
+
+
+def shard_tickers(tickers, shard):
+    """Tickers that belong to shard (k, N); all of them when shard is None"""
+    if shard is None:
+        return list(tickers)
+    k, n = shard
+    return [t for t in tickers if zlib.crc32(t.encode()) % n == k - 1]
+
+
+def checkpoint_path(root, shard=None):
+    return os.path.join(root, 'scan.json' if shard is None else f"scan-{shard[0]}-of-{shard[1]}.json")
+
+
+class ScanCheckpoint:
+    """
+    run           - identifies the scan (its end date); a checkpoint from
+                    another run (or any, with resume=False) is deleted, so a
+                    failed attempt never leaves an old result on disk
+    every_seconds - minimum time between saves requested through tick()
+    on_save       - called by tick() when a save is due; the worker flushes
+                    and saves everything there, then calls save()
+    """
+
+    def __init__(self, path, run, shard=None, resume=True, every_seconds=60):
+        self.path = path
+        self.run = run
+        self.shard = shard
+        self.every_seconds = every_seconds
+        self.on_save = None
+        self.done = set()
+        self.prior = {}
+        self.complete = False
+        self.saved_at = time.time()
+
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if resume and data.get('run') == run and data.get('shard') == (list(shard) if shard else None):
+                self.done = set(data['done'])
+                self.prior = data['counts']
+                self.complete = data['complete']
+            else:
+                os.remove(path)
+
+    def remaining(self, tickers):
+        return [t for t in tickers if t not in self.done]
+
+    def mark(self, tickers):
+        """Tickers whose signals (if any) have been handed to the writer"""
+        self.done.update(tickers)
+
+    def tick(self):
+        if self.on_save and time.time() - self.saved_at >= self.every_seconds:
+            self.on_save()
+
+    def counts(self, current):
+        """This attempt's counts plus those of earlier attempts of the same run"""
+        return {k: self.prior.get(k, 0) + current.get(k, 0) for k in COUNTERS}
+
+    def save(self, current, tickers, complete=False, regime=True):
+        data = {
+            'run': self.run,
+            'shard': list(self.shard) if self.shard else None,
+            'regime': regime,
+            'tickers': tickers,
+            'done': sorted(self.done),
+            'counts': self.counts(current),
+            'complete': complete,
+        }
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+        self.complete = complete
+        self.saved_at = time.time()
+        return data
+
+
+def merge_checkpoints(paths, run=None):
+    """
+    Combined result of a sharded run from each shard's final checkpoint:
+    {'shards', 'stale', 'complete', 'regime', 'tickers', <COUNTERS>}.
+    With run set, checkpoints of any other run are left out and counted as
+    stale. Incomplete, stale or missing shards make the run incomplete.
+    """
+    shards, stale = [], 0
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        if run is not None and data.get('run') != run:
+            print(f"  {path}: checkpoint of run {data.get('run')}, expected {run} - ignored")
+            stale += 1
+            continue
+        shards.append(data)
+    n = {s['shard'][1] for s in shards if s.get('shard')}
+    total = {'shards': len(shards), 'stale': stale, 'tickers': sum(s['tickers'] for s in shards)}
+    total.update({k: sum(s['counts'].get(k, 0) for s in shards) for k in COUNTERS})
+    total['regime'] = any(s['regime'] for s in shards)
+    total['seconds'] = max((s['counts'].get('seconds', 0) for s in shards), default=0)
+    total['complete'] = bool(shards) and not stale and all(s['complete'] for s in shards) and \
+        len(n) == 1 and len(shards) == n.pop()
+    return total
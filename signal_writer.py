@@ -0,0 +1,283 @@
+"""
+Signal Writer - Batched, concurrent, retrying upserts of screener signals
+Signals are streamed into batches whose size adapts to how the database is
+responding, a few batches are in flight at once over one client, failed
+batches are retried with backoff (writes are idempotent upserts on
+ticker + signal_date), and batches that still fail go to a dead-letter
+file to be replayed on the next run.
+
+Sinks:
+  SupabaseSink - PostgREST upsert through the (reused) supabase client
+  PostgresSink - plain Postgres over psycopg, a local stand-in for load tests
+"""
+
+import os
+import json
+import time
+import random
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from fetch_engine import error_status, RETRY_STATUS
+
+# Client errors that no retry will fix: the batch holds a row the table rejects
+REJECT_STATUS = {400, 409, 422}
+
+# The same for Postgres: SQLSTATE classes 22 (data exception) and 23 (integrity
+# constraint violation), as carried by postgrest's APIError.code and psycopg's sqlstate
+REJECT_SQLSTATE_CLASSES = ('22', '23')
+
+
+def rejected(exc):
+    """True if the error means a row in the batch is bad, not that the request failed"""
+    if error_status(exc) in REJECT_STATUS:
+        return True
+    sqlstate = getattr(exc, 'sqlstate', None) or getattr(exc, 'code', None)
+    if isinstance(sqlstate, str) and sqlstate[:2] in REJECT_SQLSTATE_CLASSES:
+        return True
+    # psycopg.DataError / IntegrityError, whatever their sqlstate
+    return any(cls.__name__ in ('DataError', 'IntegrityError') for cls in type(exc).__mro__)
+
+
+class SupabaseSink:
+    """Upserts into a Supabase table, skipping rows whose key is already stored"""
+
+    def __init__(self, client, table='signals', on_conflict='ticker,signal_date'):
+        self.client = client
+        self.table = table
+        self.on_conflict = on_conflict
+
+    def write(self, rows):
+        """Number of rows actually inserted"""
+        result = self.client.table(self.table).upsert(rows, on_conflict=self.on_conflict,
+                                                      ignore_duplicates=True).execute()
+        return len(result.data)
+
+    def close(self):
+        pass
+
+
+class PostgresSink:
+    """INSERT ... ON CONFLICT DO NOTHING into Postgres; one connection per writer thread"""
+
+    def __init__(self, dsn, table='signals', on_conflict='ticker,signal_date'):
+        import psycopg
+        self.psycopg = psycopg
+        self.dsn = dsn
+        self.table = table
+        self.on_conflict = on_conflict
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or conn.closed:
+            conn = self.local.conn = self.psycopg.connect(self.dsn)
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def write(self, rows):
+        """One multi-row INSERT per batch; returns the rows actually inserted"""
+        columns = list(rows[0])
+        row_sql = f"({', '.join(['%s'] * len(columns))})"
+        sql = (f"INSERT INTO {self.table} ({', '.join(columns)}) VALUES {', '.join([row_sql] * len(rows))} "
+               f"ON CONFLICT ({self.on_conflict}) DO NOTHING")
+        conn = self.connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, [row.get(c) for row in rows for c in columns])
+                inserted = cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return inserted
+
+    def close(self):
+        """Close every writer thread's connection"""
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+
+
+class SignalWriter:
+    """
+    batch_size    - starting rows per request; moves between min_batch and
+                    max_batch: grows while requests finish under target_seconds,
+                    halves when they are slow or fail
+    in_flight     - concurrent requests
+    flush_seconds - a partial batch is sent once its oldest row is this old,
+                    so a slow producer still persists what it found; checked
+                    on every add() and on tick(), which a producer that can
+                    go a long time between signals should call regularly
+    dead_letter   - JSON-lines file for batches that still fail after max_retries
+
+    The request pool (and the sink's per-thread connections) lives across
+    write() calls; close() shuts both down.
+    """
+
+    def __init__(self, sink, batch_size=50, min_batch=10, max_batch=500, target_seconds=2.0, in_flight=4,
+                 flush_seconds=30.0, max_retries=4, backoff=1.0, max_backoff=30.0,
+                 dead_letter='data/dead_letter_signals.jsonl'):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.target_seconds = target_seconds
+        self.in_flight = in_flight
+        self.flush_seconds = flush_seconds
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.dead_letter = dead_letter
+        self.lock = threading.Lock()
+        self.pool = None
+        self.batch = []
+        self.started = None
+        self.pending = set()
+        self.stats = {'rows': 0, 'inserted': 0, 'duplicates': 0, 'failed': 0, 'batches': 0, 'retries': 0}
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def resize(self, seconds=None):
+        """Additive increase on a fast request, halve on a slow or failed one"""
+        with self.lock:
+            if seconds is not None and seconds < self.target_seconds:
+                self.batch_size = min(self.max_batch, self.batch_size + max(1, self.batch_size // 4))
+            else:
+                self.batch_size = max(self.min_batch, self.batch_size // 2)
+
+    def send(self, rows):
+        """Write one batch with retries; returns rows inserted. Rejected batches are split to isolate bad rows."""
+        for attempt in range(self.max_retries + 1):
+            start = time.time()
+            try:
+                inserted = self.sink.write(rows)
+            except Exception as e:
+                self.resize()
+                if rejected(e):
+                    if len(rows) == 1:
+                        self.fail(rows, e)
+                        return 0
+                    half = len(rows) // 2
+                    return self.send(rows[:half]) + self.send(rows[half:])
+                status = error_status(e)
+                if attempt == self.max_retries or (status is not None and status not in RETRY_STATUS):
+                    self.fail(rows, e)
+                    return 0
+                self.count('retries')
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                time.sleep(delay * (0.5 + random.random()))
+                continue
+
+            self.resize(time.time() - start)
+            self.count('batches')
+            self.count('inserted', inserted)
+            self.count('duplicates', len(rows) - inserted)
+            return inserted
+        return 0
+
+    def fail(self, rows, error):
+        """Append a batch that could not be written to the dead-letter file"""
+        print(f"  Batch of {len(rows)} signals failed: {error}")
+        with self.lock:
+            self.stats['failed'] += len(rows)
+            if self.dead_letter:
+                os.makedirs(os.path.dirname(self.dead_letter) or '.', exist_ok=True)
+                with open(self.dead_letter, 'a') as f:
+                    f.write(json.dumps({'failed_at': datetime.now().isoformat(timespec='seconds'),
+                                        'error': str(error), 'rows': rows}, default=str) + '\n')
+
+    def submit(self):
+        """Send the current partial batch once a request slot is free"""
+        if len(self.pending) >= self.in_flight:
+            done, self.pending = wait(self.pending, return_when=FIRST_COMPLETED)
+        self.pending.add(self.pool.submit(self.send, self.batch))
+        self.batch = []
+
+    def add(self, signal):
+        """Buffer one signal; sends the batch once it is full or its oldest row is due"""
+        if not self.batch:
+            self.started = time.time()
+        self.batch.append(signal)
+        self.count('rows')
+        if len(self.batch) >= self.batch_size:
+            self.submit()
+        else:
+            self.tick()
+
+    def tick(self):
+        """Send the partial batch if its oldest row is older than flush_seconds"""
+        if self.pool is not None and self.batch and time.time() - self.started > self.flush_seconds:
+            self.submit()
+
+    def flush(self):
+        """Send the partial batch and wait for every request in flight (e.g. before a checkpoint)"""
+        if self.pool is None:
+            return
+        if self.batch:
+            self.submit()
+        wait(self.pending)
+        self.pending = set()
+
+    def write(self, signals):
+        """
+        Stream signals (any iterable, e.g. the scan pipeline) to the sink;
+        returns the stats dict. Batches are sent while the iterable is still
+        producing, so a scan that dies part-way keeps everything it found.
+        """
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.in_flight)
+        try:
+            for signal in signals:
+                self.add(signal)
+        finally:
+            # Flush what was already produced even if the producer raised
+            self.flush()
+        return self.stats
+
+    def close(self):
+        """Send anything still buffered, then shut down the request pool and the sink's connections"""
+        self.flush()
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        self.sink.close()
+
+    def replay(self):
+        """
+        Re-send every dead-lettered batch; those that fail again are written
+        back. The file is moved aside first and only deleted once the replay
+        has finished, so a crash part-way leaves it to be replayed next time.
+        """
+        if not self.dead_letter:
+            return 0
+        replaying = self.dead_letter + '.replay'
+        if os.path.exists(self.dead_letter):
+            if os.path.exists(replaying):
+                # Left over from a replay that crashed: replay both
+                with open(self.dead_letter) as src, open(replaying, 'a') as dst:
+                    dst.write(src.read())
+                os.remove(self.dead_letter)
+            else:
+                os.replace(self.dead_letter, replaying)
+        if not os.path.exists(replaying):
+            return 0
+        with open(replaying) as f:
+            rows = [row for line in f if line.strip() for row in json.loads(line)['rows']]
+        print(f"Replaying {len(rows)} dead-lettered signals...")
+        before = self.stats['inserted']
+        self.write(rows)
+        os.remove(replaying)
+        return self.stats['inserted'] - before
+
+    def report(self):
+        s = self.stats
+        return (f"{s['inserted']} inserted, {s['duplicates']} already stored, {s['failed']} failed "
+                f"of {s['rows']} in {s['batches']} batches ({s['retries']} retries, batch size now {self.batch_size})")
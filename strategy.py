@@ -0,0 +1,227 @@
+"""
+Strategy - Entry rules shared by the live worker and the backtester
+Every entry condition is a boolean mask over the whole date axis;
+MIN_GAP_DAYS spacing is applied afterwards in one pass over the candidates.
+The fundamentals score that gates candidates lives here too, so both entry
+points accept exactly the same tickers.
+"""
+
+from dataclasses import dataclass
+import numpy as np
+
+
+@dataclass
+class StrategyConfig:
+    """Entry thresholds (defaults match the live screener)"""
+    use_vix_filter: bool = True
+    vix_min: float = 20
+    vix_max: float = 35
+    use_volume_filter: bool = True
+    volume_surge_mult: float = 1.2
+    rsi_oversold: float = 35
+    rsi_signal: float = 45
+    rsi_lookback: int = 5
+    adx_min: float = 18
+    min_below_high_pct: float = 20.0
+    max_below_high_pct: float = 55.0
+    max_from_sma_pct: float = 15.0
+    min_gap_days: int = 20
+    warmup_bars: int = 260
+
+
+@dataclass
+class FundamentalConfig:
+    """Market cap floor and fundamentals scoring thresholds"""
+    use_filter: bool = True
+    min_market_cap: float = 1e9
+    max_pe_ratio: float = 30
+    pe_prefer_below: float = 20
+    max_peg_ratio: float = 2.0
+    max_price_to_book: float = 5.0
+    min_roe: float = 8.0
+    max_debt_equity: float = 2.0
+    require_positive_fcf: bool = True
+    min_score: int = 5
+
+
+def rsi_cross_mask(rsi, cfg):
+    """True at bar i if RSI crossed up through RSI_SIGNAL (or sat at/below
+    RSI_OVERSOLD) on any of the RSI_LOOKBACK bars before i.
+    Works along axis 0, so rsi may be 1-D or dates x tickers."""
+    n = len(rsi)
+    cross = np.zeros(rsi.shape, dtype=bool)
+    prev, cur = rsi[:-1], rsi[1:]
+    cross[1:] = ((prev <= cfg.rsi_signal) & (cur > cfg.rsi_signal)) | (prev <= cfg.rsi_oversold)
+
+    # Rolling OR over cross[i-L .. i-1] via a cumulative count
+    count = np.concatenate([np.zeros((1,) + rsi.shape[1:], dtype=np.int64), np.cumsum(cross, axis=0)])
+    idx = np.arange(n)
+    hi = idx                                        # count[i]   = sum(cross[:i])
+    lo = np.maximum(idx - cfg.rsi_lookback, 0)      # count[i-L] = sum(cross[:i-L])
+    return (count[hi] - count[lo]) > 0
+
+
+# Entry conditions. Each reads the arrays in `a` and only the StrategyConfig
+# fields listed next to it in MASK_PARTS, so a parameter sweep can reuse a
+# part's mask across every combination that shares those fields.
+def _valid_mask(a, cfg):
+    mask = ~(np.isnan(a['sma_200']) | np.isnan(a['high_52w']) | np.isnan(a['adx']))
+    bar = a['first_bar'] + np.cumsum(~np.isnan(a['close']), axis=0) - 1
+    return mask & (bar >= cfg.warmup_bars)
+
+
+def _vix_mask(a, cfg):
+    if not cfg.use_vix_filter:
+        return True
+    return (a['vix'] >= cfg.vix_min) & (a['vix'] <= cfg.vix_max)
+
+
+def _below_high_mask(a, cfg):
+    pct_below = (a['high_52w'] - a['close']) / a['high_52w'] * 100
+    return (pct_below >= cfg.min_below_high_pct) & (pct_below <= cfg.max_below_high_pct)
+
+
+def _trend_mask(a, cfg):
+    close, sma_200 = a['close'], a['sma_200']
+    pct_sma = np.abs(close - sma_200) / sma_200 * 100
+    return ~(pct_sma > cfg.max_from_sma_pct) & ~(close < sma_200 * 0.95) & ~(a['sma_slope'] < -2)
+
+
+def _momentum_mask(a, cfg):
+    return rsi_cross_mask(a['rsi'], cfg) & ~(a['adx'] < cfg.adx_min)
+
+
+def _volume_mask(a, cfg):
+    if not cfg.use_volume_filter:
+        return True
+    vol_avg = a['vol_avg']
+    return ~np.isnan(vol_avg) & (vol_avg != 0) & ~(a['volume'] / vol_avg < cfg.volume_surge_mult)
+
+
+MASK_PARTS = (
+    (('warmup_bars',), _valid_mask),
+    (('use_vix_filter', 'vix_min', 'vix_max'), _vix_mask),
+    (('min_below_high_pct', 'max_below_high_pct'), _below_high_mask),
+    (('max_from_sma_pct',), _trend_mask),
+    (('rsi_oversold', 'rsi_signal', 'rsi_lookback', 'adx_min'), _momentum_mask),
+    (('use_volume_filter', 'volume_surge_mult'), _volume_mask),
+)
+
+
+def mask_arrays(close, volume, rsi, adx, sma_200, sma_slope, high_52w, vol_avg, vix, first_bar=0):
+    return {'close': close, 'volume': volume, 'rsi': rsi, 'adx': adx, 'sma_200': sma_200,
+            'sma_slope': sma_slope, 'high_52w': high_52w, 'vol_avg': vol_avg, 'vix': vix,
+            'first_bar': first_bar}
+
+
+def part_mask(part, a, cfg):
+    """One MASK_PARTS entry evaluated on mask_arrays() output"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return part(a, cfg)
+
+
+def signal_mask(close, volume, rsi, adx, sma_200, sma_slope, high_52w, vol_avg, vix, cfg, first_bar=0):
+    """Boolean mask of bars meeting every entry condition.
+    Inputs are 1-D arrays for one ticker or dates x tickers arrays
+    (vix broadcast as a column); bars are counted from each ticker's first close,
+    which is bar number `first_bar` when the arrays are only a recent tail."""
+    a = mask_arrays(close, volume, rsi, adx, sma_200, sma_slope, high_52w, vol_avg, vix, first_bar)
+    mask = np.ones(np.shape(close), dtype=bool)
+    for fields, part in MASK_PARTS:
+        mask &= part_mask(part, a, cfg)
+    return mask
+
+
+def in_vix_zone(vix, cfg):
+    """VIX inside [vix_min, vix_max] (scalar or array)"""
+    return (vix >= cfg.vix_min) & (vix <= cfg.vix_max)
+
+
+def apply_min_gap(mask, min_gap):
+    """Indices of mask, keeping only entries at least min_gap bars after the previous kept one"""
+    keep = []
+    last = -min_gap
+    for i in np.flatnonzero(mask):
+        if i - last >= min_gap:
+            keep.append(i)
+            last = i
+    return np.array(keep, dtype=np.int64)
+
+
+# Fundamentals: points per .info field, passing at cfg.min_score
+def check_fundamentals(info, cfg):
+    """(passed, score, details) for a yfinance .info dict"""
+    score = 0
+    details = {}
+
+    pe = info.get('forwardPE') or info.get('trailingPE')
+    if pe and pe > 0:
+        details['pe'] = pe
+        if pe <= cfg.pe_prefer_below:
+            score += 3
+        elif pe <= cfg.max_pe_ratio:
+            score += 1
+
+    peg = info.get('pegRatio')
+    if peg and peg > 0:
+        details['peg'] = peg
+        if peg < 1:
+            score += 3
+        elif peg <= cfg.max_peg_ratio:
+            score += 1
+
+    pb = info.get('priceToBook')
+    if pb and pb > 0:
+        details['pb'] = pb
+        if pb < 2:
+            score += 2
+        elif pb <= cfg.max_price_to_book:
+            score += 1
+
+    roe = info.get('returnOnEquity')
+    if roe:
+        roe_pct = roe * 100
+        details['roe'] = roe_pct
+        if roe_pct >= 15:
+            score += 3
+        elif roe_pct >= cfg.min_roe:
+            score += 1
+
+    de = info.get('debtToEquity')
+    if de:
+        de_ratio = de / 100 if de > 10 else de
+        details['de'] = de_ratio
+        if de_ratio < 0.5:
+            score += 2
+        elif de_ratio <= cfg.max_debt_equity:
+            score += 1
+
+    fcf = info.get('freeCashflow')
+    if fcf:
+        details['fcf'] = fcf
+        if fcf > 0:
+            score += 2
+        elif cfg.require_positive_fcf:
+            score -= 2
+
+    eg = info.get('earningsGrowth')
+    if eg and eg > 0:
+        details['earnings_growth'] = eg * 100
+        if eg > 0.20:
+            score += 2
+        elif eg > 0:
+            score += 1
+
+    details['score'] = score
+    return score >= cfg.min_score, score, details
+
+
+def fundamentals_gate(info, cfg):
+    """Market cap and fundamentals gate -> (status, score, details);
+    status is 'low_cap', 'failed_fundamentals' or 'success'"""
+    if (info.get('marketCap', 0) or 0) < cfg.min_market_cap:
+        return 'low_cap', 0, {}
+    passed, score, details = check_fundamentals(info, cfg)
+    if cfg.use_filter and not passed:
+        return 'failed_fundamentals', score, details
+    return 'success', score, details
@@ -63,6 +63,33 @@ CREATE INDEX idx_picks_status ON screener_picks(status);
 CREATE INDEX idx_picks_score ON screener_picks(signal_score DESC);
 CREATE INDEX idx_picks_strength ON screener_picks(signal_strength);
 
+-- =============================================================================
+-- WORKER SIGNALS TABLE (worker/screener_worker.py)
+-- =============================================================================
+-- Kept across schema re-runs; the worker upserts with
+-- on_conflict='ticker,signal_date' and ignores duplicates
+CREATE TABLE IF NOT EXISTS signals (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    ticker VARCHAR(10) NOT NULL,
+    signal_date DATE NOT NULL,
+    entry_price DECIMAL(10, 2) NOT NULL,
+    vix DECIMAL(5, 1),
+    rsi DECIMAL(5, 1),
+    adx DECIMAL(5, 1),
+    pct_below_high DECIMAL(5, 1),
+    sector VARCHAR(50),
+    pe_ratio DECIMAL(10, 2),
+    peg_ratio DECIMAL(10, 2),
+    roe DECIMAL(5, 1),
+    debt_equity DECIMAL(8, 2),
+    fund_score INTEGER,
+    status VARCHAR(20) DEFAULT 'active',
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Dedup key; also serves the worker's "signals since <date>" reads
+CREATE UNIQUE INDEX IF NOT EXISTS idx_signals_date_ticker ON signals(signal_date, ticker);
+
 -- =============================================================================
 -- VIX HISTORY TABLE
 -- =============================================================================
@@ -0,0 +1,287 @@
+"""
+Sweep - Grid search over entry and exit thresholds
+Prices are read once from the local price store and the parameter-free
+indicators (RSI, ADX, SMA200, 52-week high, volume average) are computed
+once per ticker. Each entry condition's mask is cached by the config
+fields it reads (strategy.MASK_PARTS) and entries by the whole entry
+config, so a combination only pays for the parts that changed plus its
+exits. Tickers are spread over a process pool.
+
+With daily=True each combination's trades are also marked to market on
+the VIX calendar and summed over tickers, adding drawdown, Sharpe/Sortino,
+exposure and beta (vs a benchmark such as SPY) to the results table.
+
+The universe is the stored tickers that pass the fundamentals gate, the
+same one backtest_vs_spy trades (backtest_runner.gate_fundamentals).
+
+Usage: python sweep.py   (writes sweep_results.csv; edit GRID below)
+"""
+
+import os
+import itertools
+import dataclasses
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from price_store import PriceStore
+from calendar_index import to_day, align
+from strategy import StrategyConfig, FundamentalConfig, MASK_PARTS, part_mask, apply_min_gap
+from exit_engine import ExitConfig, simulate_exits, STILL_OPEN
+from backtest_runner import ticker_arrays, window, stored_tickers, gate_fundamentals
+from fundamentals_cache import FundamentalsCache
+from metrics import mark_to_market, risk_metrics
+
+# Example grid: the VIX ceiling the README calls "optimized" plus a few neighbours
+GRID = {
+    'vix_min': [15, 20],
+    'vix_max': [30, 35, 40, 50],
+    'rsi_signal': [40, 45, 50],
+    'adx_min': [15, 18, 22],
+    'stop_loss_pct': [10.0, 15.0],
+    'take_profit_pct': [30.0, 50.0],
+}
+
+START_DATE = '2019-01-01'
+PRICE_STORE_DIR = 'data/prices'
+
+# Fundamentals (.info) cache shared with the backtest and the worker
+FUNDAMENTALS_PATH = 'data/fundamentals.json'
+FUNDAMENTALS_TTL_DAYS = 7
+
+# Per-ticker sums; the results table is derived from these
+STAT_COLUMNS = ('trades', 'closed', 'wins', 'return_sum', 'gross_win', 'gross_loss', 'closed_pnl', 'open_pnl')
+
+_worker = {}
+
+
+def expand_grid(grid, base_signal=None, base_exit=None):
+    """{field: [values]} over StrategyConfig/ExitConfig fields -> [(params, signal_cfg, exit_cfg)]"""
+    base_signal = base_signal or StrategyConfig()
+    base_exit = base_exit or ExitConfig()
+    signal_fields = {f.name for f in dataclasses.fields(StrategyConfig)}
+    exit_fields = {f.name for f in dataclasses.fields(ExitConfig)}
+    unknown = set(grid) - signal_fields - exit_fields
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+
+    names = list(grid)
+    combos = []
+    for values in itertools.product(*(grid[n] for n in names)):
+        params = dict(zip(names, values))
+        signal_cfg = dataclasses.replace(base_signal, **{k: v for k, v in params.items() if k in signal_fields})
+        exit_cfg = dataclasses.replace(base_exit, **{k: v for k, v in params.items() if k in exit_fields})
+        combos.append((params, signal_cfg, exit_cfg))
+    return combos
+
+
+def combo_entries(a, cfg, part_cache=None, lo=0, hi=None):
+    """Entry bars for cfg within bars [lo, hi); part masks are memoized in part_cache"""
+    part_cache = {} if part_cache is None else part_cache
+    mask = np.ones(len(a['close']), dtype=bool)
+    for p, (fields, part) in enumerate(MASK_PARTS):
+        key = (p,) + tuple(getattr(cfg, f) for f in fields)
+        if key not in part_cache:
+            part_cache[key] = part_mask(part, a, cfg)
+        mask &= part_cache[key]
+    mask[:lo] = False
+    if hi is not None:
+        mask[hi:] = False
+    return apply_min_gap(mask, cfg.min_gap_days)
+
+
+def position_size(exit_cfg, sizing):
+    """Dollar position per trade, as sized by the backtest"""
+    capital, risk_pct, max_position_pct = sizing
+    return min(capital * risk_pct / 100 / (exit_cfg.stop_loss_pct / 100), capital * max_position_pct / 100)
+
+
+def combo_stats(high, low, a, combos, sizing=(100000, 1.0, 15.0), lo=0, hi=None, days=None, calendar=None):
+    """
+    len(combos) x len(STAT_COLUMNS) trade stats for one ticker's prepared
+    arrays, counting entries within bars [lo, hi). With a calendar (and the
+    ticker's epoch days) also returns len(combos) x len(calendar) daily P&L
+    and gross position value: (stats, pnl, gross).
+    """
+    close = a['close']
+    part_cache, entry_cache = {}, {}
+    stats = np.zeros((len(combos), len(STAT_COLUMNS)))
+    if calendar is not None:
+        # P&L on days missing from the calendar lands on the next calendar day;
+        # position values carry forward over calendar days the ticker did not trade
+        rows = np.searchsorted(calendar, days)
+        keep = rows < len(calendar)
+        last_bar = np.searchsorted(days, calendar, 'right') - 1
+        traded = last_bar >= 0
+        pnl_daily = np.zeros((len(combos), len(calendar)))
+        gross_daily = np.zeros((len(combos), len(calendar)))
+    for c, (params, signal_cfg, exit_cfg) in enumerate(combos):
+        entry_key = dataclasses.astuple(signal_cfg)
+        entries = entry_cache.get(entry_key)
+        if entries is None:
+            entries = entry_cache[entry_key] = combo_entries(a, signal_cfg, part_cache, lo, hi)
+        if len(entries) == 0:
+            continue
+
+        # Same sizing and rounding as the backtest's result rows
+        exits = simulate_exits(close, high, low, entries, exit_cfg)
+        pnl = np.round(position_size(exit_cfg, sizing) * exits['return_pct'] / 100, 0)
+        ret = np.round(exits['return_pct'], 2)
+        closed = exits['reason'] != STILL_OPEN
+        r = ret[closed]
+        wins = r > 0
+        stats[c] = (len(ret), closed.sum(), wins.sum(), r.sum(), r[wins].sum(), -r[~wins].sum(),
+                    pnl[closed].sum(), pnl[~closed].sum())
+
+        if calendar is not None:
+            shares = position_size(exit_cfg, sizing) / close[entries]
+            day_pnl, held = mark_to_market(close, entries, exits['exit_idx'], shares,
+                                           close[entries], exits['exit_price'])
+            np.add.at(pnl_daily[c], rows[keep], day_pnl[keep])
+            gross_daily[c, traded] = (held * close)[last_bar[traded]]
+
+    if calendar is not None:
+        return stats, pnl_daily, gross_daily
+    return stats
+
+
+def sweep_records(rec, vix_days, vix_close, combos, sizing=(100000, 1.0, 15.0),
+                  sma_slope_days=20, volume_avg_days=50, calendar=None):
+    """len(combos) x len(STAT_COLUMNS) array of trade stats for one ticker
+    (plus daily P&L and gross value on `calendar`, see combo_stats)"""
+    high, low, a = ticker_arrays(rec, vix_days, vix_close, sma_slope_days, volume_avg_days)
+    return combo_stats(high, low, a, combos, sizing, days=np.asarray(rec['day']), calendar=calendar)
+
+
+def _init_worker(store_root, vix_days, vix_close, combos, params):
+    _worker.clear()
+    _worker.update(params, store=PriceStore(store_root), vix_days=vix_days, vix_close=vix_close, combos=combos)
+
+
+def _sweep_ticker(ticker):
+    """(status, result) for one ticker; status is 'success', 'no_data' or 'error'"""
+    w = _worker
+    try:
+        rec = window(w['store'].read(ticker), w['start_day'], w['end_day'], w['min_bars'])
+        if rec is None:
+            return 'no_data', None
+        return 'success', sweep_records(rec, w['vix_days'], w['vix_close'], w['combos'], w['sizing'],
+                                        w['sma_slope_days'], w['volume_avg_days'], w['calendar'])
+    except Exception as e:
+        print(f"  {ticker}: {type(e).__name__}: {e}")
+        return 'error', None
+
+
+def _sweep_chunk(tickers):
+    """(summed results, {status: count}) for a run of tickers, so daily matrices are not shipped per ticker"""
+    total, counts = None, {}
+    for ticker in tickers:
+        status, r = _sweep_ticker(ticker)
+        counts[status] = counts.get(status, 0) + 1
+        if r is None:
+            continue
+        r = r if isinstance(r, tuple) else (r,)
+        total = list(r) if total is None else [t + x for t, x in zip(total, r)]
+    return total, counts
+
+
+def results_table(combos, totals, risk=None):
+    """One row per combination: its parameters plus summary stats
+    (and the per-combination arrays of `risk`, e.g. from risk_metrics)"""
+    rows = []
+    for c, ((params, _, _), s) in enumerate(zip(combos, totals)):
+        s = dict(zip(STAT_COLUMNS, s))
+        closed = s['closed']
+        rows.append({
+            **params,
+            'trades': int(s['trades']),
+            'closed': int(closed),
+            'win_rate': s['wins'] / closed * 100 if closed else np.nan,
+            'avg_return': s['return_sum'] / closed if closed else np.nan,
+            'profit_factor': s['gross_win'] / s['gross_loss'] if s['gross_loss'] else np.nan,
+            'closed_pnl': s['closed_pnl'],
+            'open_pnl': s['open_pnl'],
+            'total_pnl': s['closed_pnl'] + s['open_pnl'],
+            **{k: v[c] for k, v in (risk or {}).items()},
+        })
+    return pd.DataFrame(rows)
+
+
+def run_sweep(grid, tickers, store_root, vix_days, vix_close, start_date, end_date,
+              base_signal=None, base_exit=None, sizing=(100000, 1.0, 15.0), min_bars=500,
+              sma_slope_days=20, volume_avg_days=50, workers=None, chunksize=8,
+              daily=False, benchmark=None):
+    """
+    Evaluate every combination of `grid` over `tickers` (already in the
+    price store and, to match the backtest, through gate_fundamentals).
+    sizing = (starting capital, risk per trade %, max position %).
+    daily=True adds daily mark-to-market risk columns; benchmark is an
+    optional (days, close) pair (e.g. SPY) for beta.
+    Returns the results table (combinations in grid order).
+    """
+    combos = expand_grid(grid, base_signal, base_exit)
+    start_day, end_day = to_day(start_date), to_day(end_date)
+    vix_days = np.asarray(vix_days)
+    calendar = vix_days[(vix_days >= start_day) & (vix_days < end_day)] if daily else None
+    params = {
+        'start_day': start_day, 'end_day': end_day, 'min_bars': min_bars, 'calendar': calendar,
+        'sizing': sizing, 'sma_slope_days': sma_slope_days, 'volume_avg_days': volume_avg_days,
+    }
+    init_args = (store_root, vix_days, np.asarray(vix_close), combos, params)
+    workers = workers or os.cpu_count() or 1
+
+    # Contiguous chunks summed in ticker order so totals do not depend on scheduling
+    chunks = [tickers[i:i + chunksize] for i in range(0, len(tickers), chunksize)]
+    if workers == 1 or len(chunks) <= 1:
+        _init_worker(*init_args)
+        per_chunk = [_sweep_chunk(c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            per_chunk = list(pool.map(_sweep_chunk, chunks))
+
+    totals = np.zeros((len(combos), len(STAT_COLUMNS)))
+    pnl = np.zeros((len(combos), 0 if calendar is None else len(calendar)))
+    gross = np.zeros_like(pnl)
+    counts = {}
+    for r, chunk_counts in per_chunk:
+        for status, n in chunk_counts.items():
+            counts[status] = counts.get(status, 0) + n
+        if r is None:
+            continue
+        totals += r[0]
+        if daily:
+            pnl += r[1]
+            gross += r[2]
+
+    risk = None
+    if daily and len(calendar) > 1:
+        equity = sizing[0] + np.cumsum(pnl, axis=1)
+        bench = None
+        if benchmark is not None:
+            bench = pd.Series(align(np.asarray(benchmark[0]), np.asarray(benchmark[1]), calendar)).ffill().bfill().values
+        m = risk_metrics(equity, bench, gross / equity)
+        risk = {k: m[k] for k in ('max_drawdown_pct', 'sharpe', 'sortino', 'avg_exposure_pct', 'beta') if k in m}
+    print(f"Sweep tickers: {counts}")
+    return results_table(combos, totals, risk)
+
+
+if __name__ == '__main__':
+    from datetime import datetime
+    from data_source import YahooSource
+
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    store = PriceStore(PRICE_STORE_DIR)
+    store.update(['^VIX', 'SPY'], START_DATE, end_date)
+    vix, spy = store.read('^VIX'), store.read('SPY')
+
+    print("Checking fundamentals...")
+    fundamentals = FundamentalsCache(FUNDAMENTALS_PATH, FUNDAMENTALS_TTL_DAYS)
+    tickers = list(gate_fundamentals(stored_tickers(store), fundamentals, YahooSource().infos, FundamentalConfig()))
+
+    combos = len(expand_grid(GRID))
+    print(f"Sweeping {combos} combinations over {len(tickers)} stored tickers...")
+    table = run_sweep(GRID, tickers, PRICE_STORE_DIR, vix['day'], vix['close'], START_DATE, end_date,
+                      daily=True, benchmark=(spy['day'], spy['close']))
+    table.to_csv('sweep_results.csv', index=False)
+    print(table.sort_values('total_pnl', ascending=False).head(20).to_string(index=False))
+    print("\nResults saved to sweep_results.csv")
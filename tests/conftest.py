@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Flat modules live in the repo root, the worker in worker/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'worker')]
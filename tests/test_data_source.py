@@ -0,0 +1,26 @@
+"""DataSource interface and the cache source's benchmark series"""
+
+import pytest
+
+from data_source import DataSource, CacheSource
+
+
+def test_incomplete_source_fails_on_construction():
+    class NoInfos(DataSource):
+        def history(self, ticker, start_date, end_date):
+            return None
+
+        def price_batch(self, tickers, start_date, end_date):
+            return {}
+
+        def universe(self, mode='medium'):
+            return []
+
+    with pytest.raises(TypeError, match='infos'):
+        NoInfos()
+
+
+def test_cache_source_without_vix_fails_clearly(tmp_path):
+    source = CacheSource(str(tmp_path / 'prices'), str(tmp_path / 'fundamentals.json'))
+    with pytest.raises(ValueError, match=r'\^VIX'):
+        source.vix('2025-01-01', '2025-12-31')
@@ -0,0 +1,82 @@
+"""simulate_exits vs the per-day execute_trade loop it replaced"""
+
+import numpy as np
+import pytest
+
+from data_source import SyntheticSource
+from exit_engine import ExitConfig, simulate_exits, EXIT_REASONS
+
+
+def execute_trade(close, high, low, entry_idx, entry_price, cfg):
+    """The original backtest_vs_spy loop, with its constants taken from cfg; exit_idx -1 while open"""
+    stop_price = entry_price * (1 - cfg.stop_loss_pct / 100)
+    tp_price = entry_price * (1 + cfg.take_profit_pct / 100)
+    activation_price = entry_price * (1 + cfg.trail_activation_pct / 100)
+    highest_high = entry_price
+    trailing_active = False
+    trailing_stop = stop_price
+
+    for day in range(1, cfg.max_hold_days + 1):
+        idx = entry_idx + day
+        if idx >= len(close):
+            return ((close[-1] - entry_price) / entry_price * 100, day, 'still_open', -1, close[-1],
+                    trailing_active)
+
+        day_high, day_low = high[idx], low[idx]
+        if day_high > highest_high:
+            highest_high = day_high
+
+        if cfg.use_trailing and not trailing_active and day_high >= activation_price:
+            trailing_active = True
+        if trailing_active:
+            trailing_stop = max(trailing_stop, highest_high * (1 - cfg.trail_distance_pct / 100))
+
+        current_stop = trailing_stop if trailing_active else stop_price
+
+        if day_low <= current_stop:
+            return ((current_stop - entry_price) / entry_price * 100, day,
+                    'trail_stop' if trailing_active else 'stop', idx, current_stop, trailing_active)
+        if day_high >= tp_price:
+            return cfg.take_profit_pct, day, 'target', idx, tp_price, trailing_active
+
+    exit_price = close[entry_idx + cfg.max_hold_days]
+    return ((exit_price - entry_price) / entry_price * 100, cfg.max_hold_days, 'max_days',
+            entry_idx + cfg.max_hold_days, exit_price, trailing_active)
+
+
+CONFIGS = [
+    ExitConfig(),
+    ExitConfig(use_trailing=False),
+    ExitConfig(stop_loss_pct=5, take_profit_pct=10, trail_activation_pct=4, trail_distance_pct=3, max_hold_days=30),
+    ExitConfig(stop_loss_pct=30, take_profit_pct=200, max_hold_days=250),
+]
+
+
+@pytest.mark.parametrize('cfg', CONFIGS)
+def test_matches_loop(cfg):
+    source = SyntheticSource(n_tickers=20, n_bars=900)
+    rng = np.random.default_rng(7)
+    mismatches = []
+    for ticker in source.universe():
+        _, high, low, close, _ = source.bars(ticker)
+        # Entries everywhere, including the last bars so trades run out of history
+        entries = np.sort(rng.choice(len(close), 300, replace=False))
+        got = simulate_exits(close, high, low, entries, cfg, batch_size=128)
+        for j, e in enumerate(entries):
+            ret, day, reason, exit_idx, price, trailing = execute_trade(close, high, low, e, close[e], cfg)
+            actual = (got['return_pct'][j], got['exit_day'][j], EXIT_REASONS[got['reason'][j]],
+                      got['exit_idx'][j], got['exit_price'][j], bool(got['trailing_activated'][j]))
+            expected = (ret, day, reason, exit_idx, price, trailing)
+            if not (np.allclose(actual[0], ret) and actual[1:4] == expected[1:4] and np.isclose(actual[4], price)
+                    and actual[5] == trailing):
+                mismatches.append((ticker, int(e), actual, expected))
+    assert mismatches == []
+
+
+def test_entry_prices_override_close():
+    close = np.array([100.0, 101, 102, 103, 200, 201])
+    high, low = close * 1.01, close * 0.99
+    got = simulate_exits(close, high, low, [0], ExitConfig(), entry_prices=[120.0])
+    ret, day, reason, exit_idx, price, trailing = execute_trade(close, high, low, 0, 120.0, ExitConfig())
+    assert EXIT_REASONS[got['reason'][0]] == reason == 'stop'
+    assert got['exit_idx'][0] == exit_idx and np.isclose(got['exit_price'][0], price)
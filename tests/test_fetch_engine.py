@@ -0,0 +1,101 @@
+"""FetchScheduler against a local stub HTTP server"""
+
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from fetch_engine import FetchScheduler
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """/ok/<n> -> 200; /flaky/<n> -> 429 on the first hit of each path, then 200; /missing -> 404"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            first = server.hits[self.path] == 1
+        time.sleep(server.delay)
+        if self.path.startswith('/missing'):
+            status = 404
+        elif self.path.startswith('/flaky') and first:
+            status = 429
+        else:
+            status = 200
+        with server.lock:
+            server.active -= 1
+        body = self.path.encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    httpd.lock = threading.Lock()
+    httpd.hits, httpd.active, httpd.peak, httpd.delay = {}, 0, 0, 0.05
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(url):
+    response = requests.get(url, timeout=5)
+    response.raise_for_status()
+    return response.text
+
+
+def test_map_returns_every_result(server):
+    scheduler = FetchScheduler(max_workers=8, rate=100)
+    urls = [f"{server.url}/ok/{i}" for i in range(40)]
+    results, errors = scheduler.map(get, urls)
+    assert errors == {}
+    assert {u: results[u] for u in urls} == {u: u[len(server.url):] for u in urls}
+    assert scheduler.stats['requests'] == 40
+
+
+def test_rate_limit_is_respected(server):
+    server.delay = 0
+    scheduler = FetchScheduler(max_workers=8, rate=20, burst=1)
+    start = time.time()
+    scheduler.map(get, [f"{server.url}/ok/{i}" for i in range(21)])
+    # 1 burst token, then 20 more at 20/s
+    assert time.time() - start >= 0.9
+
+
+def test_host_limit_caps_concurrency(server):
+    host = server.url.split('//')[1]
+    scheduler = FetchScheduler(max_workers=8, rate=1000, host_limits={host: 2})
+    scheduler.map(get, [f"{server.url}/ok/{i}" for i in range(16)], host=host)
+    assert server.peak <= 2
+
+
+def test_429_is_retried_and_throttles(server):
+    scheduler = FetchScheduler(max_workers=4, rate=1000, backoff=0.01)
+    urls = [f"{server.url}/flaky/{i}" for i in range(8)]
+    results, errors = scheduler.map(get, urls)
+    assert errors == {} and len(results) == 8
+    assert scheduler.stats['throttled'] == 8
+    assert scheduler.stats['retries'] == 8
+    assert scheduler.bucket.rate < 1000
+
+
+def test_client_errors_fail_without_retry(server):
+    scheduler = FetchScheduler(max_workers=2, rate=1000, backoff=0.01)
+    results, errors = scheduler.map(get, [f"{server.url}/missing/{i}" for i in range(3)] + [f"{server.url}/ok/x"])
+    assert len(errors) == 3 and len(results) == 1
+    assert scheduler.stats['retries'] == 0 and scheduler.stats['failed'] == 3
+    assert all(hits == 1 for hits in server.hits.values())
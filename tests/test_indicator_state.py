@@ -0,0 +1,110 @@
+"""Streaming IndicatorState vs indicators.compute_indicators over the same bars"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_source import SyntheticSource
+from indicators import compute_indicators
+from indicator_state import IndicatorStateStore, TAIL_FIELDS
+from price_store import frame_to_records
+
+TICKERS = ['S0000', 'S0001', 'S0002', 'S0003', 'S0004']
+TAIL = 60
+TOLERANCE = 1e-8
+
+
+@pytest.fixture(scope='module')
+def source():
+    return SyntheticSource(n_tickers=len(TICKERS), n_bars=700)
+
+
+def records(source, ticker):
+    return frame_to_records(source.history(ticker, '1900-01-01', '2100-01-01'))
+
+
+def expected_tail(rec):
+    close, high, low, volume = (rec[c].astype(np.float64) for c in ('close', 'high', 'low', 'volume'))
+    ind = compute_indicators(pd.Series(close), pd.Series(high), pd.Series(low), pd.Series(volume))
+    columns = {'day': rec['day'], 'close': close, 'volume': volume, 'rsi': ind['rsi'], 'adx': ind['adx'],
+               'sma_200': ind['sma_200'], 'sma_slope': ind['sma_slope'], 'high_52w': ind['high_52w'],
+               'vol_avg': ind['vol_avg']}
+    return {f: np.asarray(columns[f])[-TAIL:] for f in TAIL_FIELDS}
+
+
+def assert_tail_matches(state, rec):
+    tail, first_bar = state.tail_arrays()
+    assert first_bar == len(rec) - TAIL
+    expected = expected_tail(rec)
+    for f in TAIL_FIELDS:
+        np.testing.assert_allclose(tail[f], expected[f], rtol=TOLERANCE, atol=TOLERANCE, equal_nan=True, err_msg=f)
+
+
+@pytest.mark.parametrize('ticker', TICKERS)
+def test_full_build_matches_batch(source, ticker, tmp_path):
+    rec = records(source, ticker)
+    state, applied = IndicatorStateStore(str(tmp_path), tail_size=TAIL).advance(ticker, rec)
+    assert applied == len(rec)
+    assert_tail_matches(state, rec)
+
+
+@pytest.mark.parametrize('ticker', TICKERS)
+def test_daily_updates_after_reload_match_batch(source, ticker, tmp_path):
+    rec = records(source, ticker)
+    store = IndicatorStateStore(str(tmp_path), tail_size=TAIL)
+    store.advance(ticker, rec[:500])
+    store.save()
+
+    # A few new bars per "day", each from a freshly loaded store
+    done = 500
+    for n in range(501, len(rec) + 1, 37):
+        store = IndicatorStateStore(str(tmp_path), tail_size=TAIL)
+        state, applied = store.advance(ticker, rec[:n])
+        assert applied == n - done and state.bars == n
+        store.save()
+        done = n
+    assert_tail_matches(state, rec[:n])
+
+
+def test_readjusted_history_is_rebuilt(source, tmp_path):
+    rec = records(source, 'S0000')
+    store = IndicatorStateStore(str(tmp_path), tail_size=TAIL)
+    store.advance('S0000', rec[:600])
+
+    adjusted = rec.copy()
+    for col in ('open', 'high', 'low', 'close'):
+        adjusted[col] *= 0.5
+    state, applied = store.advance('S0000', adjusted)
+    assert applied == len(adjusted)
+    assert_tail_matches(state, adjusted)
+
+
+def test_save_writes_only_advanced_tickers(source, tmp_path):
+    store = IndicatorStateStore(str(tmp_path), tail_size=TAIL)
+    for ticker in TICKERS:
+        store.advance(ticker, records(source, ticker)[:-1])
+    store.save()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"{t}.pkl" for t in TICKERS]
+
+    store = IndicatorStateStore(str(tmp_path), tail_size=TAIL)
+    mtimes = {p.name: p.stat().st_mtime_ns for p in tmp_path.iterdir()}
+    store.advance('S0000', records(source, 'S0000'))
+    store.advance('S0001', records(source, 'S0001')[:-1])  # already up to date
+    assert store.dirty == {'S0000'}
+    store.save()
+    changed = {p.name for p in tmp_path.iterdir() if p.stat().st_mtime_ns != mtimes[p.name]}
+    assert changed == {'S0000.pkl'}
+
+
+def test_save_evicts_persisted_states(source, tmp_path):
+    store = IndicatorStateStore(str(tmp_path), tail_size=TAIL)
+    for ticker in TICKERS:
+        store.advance(ticker, records(source, ticker)[:-1])
+    store.save()
+    assert store.states == {} and store.dirty == set()
+
+    # Evicted states are read back from disk on the next advance
+    rec = records(source, 'S0002')
+    state, applied = store.advance('S0002', rec)
+    assert applied == 1
+    assert_tail_matches(state, rec)
@@ -0,0 +1,127 @@
+"""
+Worker path vs backtest path on a fixed synthetic panel: the live worker's
+streamed screen (run every LOOKBACK_DAYS bars, as a daily job would see it)
+must find the same signals as the backtest's full-history mask, and those
+signals must give the backtest's trades.
+"""
+
+import io
+import contextlib
+import dataclasses
+
+import numpy as np
+import pytest
+
+import backtest_vs_spy as bt
+import screener_worker as worker
+from backtest_runner import ticker_arrays, window
+from calendar_index import to_day
+from data_source import SyntheticSource
+from exit_engine import simulate_exits, EXIT_REASONS
+from indicator_state import IndicatorStateStore
+from price_store import PriceStore
+from strategy import signal_mask, apply_min_gap, fundamentals_gate
+
+N_TICKERS = 60
+N_BARS = 900
+
+
+@pytest.fixture(scope='module')
+def market(tmp_path_factory):
+    root = tmp_path_factory.mktemp('parity')
+    source = SyntheticSource(n_tickers=N_TICKERS, n_bars=N_BARS)
+    start = str(source.index[0].date())
+    end = str((source.index[-1] + np.timedelta64(1, 'D')).date())
+    config = bt.BacktestConfig(start_date=start, end_date=end, workers=1,
+                               price_store_dir=str(root / 'prices'),
+                               fundamentals_path=str(root / 'fundamentals.json'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = bt.run_backtest(config, source.universe(), source)
+    market = {'source': source, 'config': config, 'result': result, 'root': root,
+              'store': PriceStore(config.price_store_dir), 'vix': source.vix(start, end)}
+    market['worker'] = {t: worker_signals(market, t) for t in source.universe()}
+    return market
+
+
+def worker_signals(market, ticker):
+    """Signals the worker reports for `ticker` over daily runs, as {epoch day: build_signal row}"""
+    rec = window(market['store'].read(ticker), to_day(market['config'].start_date),
+                 to_day(market['config'].end_date), market['config'].min_bars)
+    states = IndicatorStateStore(str(market['root'] / 'state' / ticker), sma_slope_days=worker.SMA_SLOPE_DAYS,
+                                 volume_avg_days=worker.VOLUME_AVG_DAYS,
+                                 tail_size=worker.LOOKBACK_DAYS + worker.SIGNAL_CONFIG.rsi_lookback + 1)
+    info = market['source'].infos([ticker])[0][ticker]
+    status, fund_score, fund_details = fundamentals_gate(info, worker.FUNDAMENTAL_CONFIG)
+    runs = list(range(worker.MIN_BARS, len(rec), worker.LOOKBACK_DAYS)) + [len(rec)]
+
+    signals = {}
+    for n in runs:
+        state, _ = states.advance(ticker, rec[:n])
+        tail, vix, mask = worker.screen_ticker(state, *market['vix'])
+        for i in np.flatnonzero(mask):
+            signals.setdefault(int(tail['day'][i]), worker.build_signal(ticker, i, tail, vix, info, fund_score,
+                                                                        fund_details))
+    return rec, status, signals
+
+
+def test_configs_are_shared():
+    config = bt.BacktestConfig()
+    assert config.signal == worker.SIGNAL_CONFIG
+    assert config.fundamentals == worker.FUNDAMENTAL_CONFIG
+
+
+def test_signals_match_backtest_mask(market):
+    vix_days, vix_close = market['vix']
+    cfg = market['config']
+    compared = 0
+    for ticker in market['source'].universe():
+        rec, _, signals = market['worker'][ticker]
+        high, low, a = ticker_arrays(rec, vix_days, vix_close, cfg.sma_slope_days, cfg.volume_avg_days)
+        mask = signal_mask(a['close'], a['volume'], a['rsi'], a['adx'], a['sma_200'], a['sma_slope'],
+                           a['high_52w'], a['vol_avg'], a['vix'], cfg.signal)
+        mask[:worker.MIN_BARS - worker.LOOKBACK_DAYS] = False  # before the worker's first run
+        bars = np.flatnonzero(mask)
+        assert sorted(signals) == rec['day'][bars].tolist(), ticker
+
+        for i in bars:
+            s = signals[int(rec['day'][i])]
+            assert (s['entry_price'], s['vix'], s['rsi'], s['adx']) == (
+                round(float(a['close'][i]), 2), round(float(a['vix'][i]), 1),
+                round(float(a['rsi'][i]), 1), round(float(a['adx'][i]), 1)), (ticker, i)
+        compared += len(bars)
+    assert compared > 0
+
+
+def test_worker_signals_give_backtest_trades(market):
+    cfg = market['config']
+    trades = market['result']['trades']
+    expected = sorted(
+        (r.ticker, int(to_day(r.entry_date)), r.entry_price, r.vix,
+         None if r.exit_date != r.exit_date else int(to_day(r.exit_date)), r.exit_price, r.return_pct, r.exit_reason)
+        for r in trades.itertuples())
+
+    got = []
+    for ticker in market['source'].universe():
+        rec, status, signals = market['worker'][ticker]
+        if status != 'success':
+            continue
+        close, high, low = (np.asarray(rec[c], dtype=np.float64) for c in ('close', 'high', 'low'))
+        mask = np.isin(rec['day'], list(signals))
+        entries = apply_min_gap(mask, cfg.signal.min_gap_days)
+        exits = simulate_exits(close, high, low, entries, cfg.exit)
+        for j, i in enumerate(entries):
+            s = signals[int(rec['day'][i])]
+            exit_idx = exits['exit_idx'][j]
+            got.append((ticker, int(rec['day'][i]), s['entry_price'], s['vix'],
+                        int(rec['day'][exit_idx]) if exit_idx >= 0 else None,
+                        round(exits['exit_price'][j], 2), round(exits['return_pct'][j], 2),
+                        EXIT_REASONS[exits['reason'][j]]))
+    assert len(expected) > 0
+    assert sorted(got) == expected
+
+
+def test_fundamentals_gate_matches(market):
+    traded = set(market['result']['trades']['ticker'])
+    passed = {t for t in market['source'].universe() if market['worker'][t][1] == 'success'}
+    assert traded <= passed
+    assert dataclasses.astuple(market['config'].fundamentals) == dataclasses.astuple(worker.FUNDAMENTAL_CONFIG)
@@ -0,0 +1,36 @@
+"""PriceStore incremental updates and re-adjusted history"""
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+
+
+def bars(start, n, scale=1.0):
+    index = pd.bdate_range(start, periods=n, name='Date')
+    close = scale * (100.0 + np.arange(n))
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': np.full(n, 1e6)}, index=index)
+
+
+def test_failed_redownload_is_retried(tmp_path):
+    store = PriceStore(str(tmp_path))
+    history = bars('2026-01-01', 40)
+    store.update(['AAA'], '2026-01-01', '2026-12-31', lambda batch, s, e: {'AAA': history}, benchmarks=False)
+    store.index['AAA']['checked'] -= 1
+    stored = np.array(store.read('AAA')['close'])
+
+    # The tail no longer matches (history was re-adjusted) and the full re-download fails
+    def readjusted(batch, start, end):
+        return {'AAA': bars(start, 5, scale=0.5)} if start != '2026-01-01' else {}
+
+    stats = store.update(['AAA'], '2026-01-01', '2026-12-31', readjusted, benchmarks=False)
+    assert stats['full'] == 0 and stats['empty'] == 1
+    assert np.array_equal(store.read('AAA')['close'], stored)
+
+    # Not stamped as checked today, so the next run re-downloads it
+    adjusted = bars('2026-01-01', 41, scale=0.5)
+    stats = store.update(['AAA'], '2026-01-01', '2026-12-31', lambda batch, s, e: {'AAA': adjusted[s:]},
+                         benchmarks=False)
+    assert stats['cached'] == 0 and stats['full'] == 1
+    assert np.allclose(store.read('AAA')['close'], adjusted['Close'].values)
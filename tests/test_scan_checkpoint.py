@@ -0,0 +1,44 @@
+"""ScanCheckpoint resume rules and merging shard checkpoints"""
+
+import os
+
+from scan_checkpoint import ScanCheckpoint, checkpoint_path, merge_checkpoints
+
+
+def finished(root, run, shard, tickers):
+    checkpoint = ScanCheckpoint(checkpoint_path(root, shard), run, shard)
+    checkpoint.mark(tickers)
+    checkpoint.save({'success': len(tickers), 'signals': 1, 'inserted': 1, 'seconds': 5.0}, len(tickers),
+                    complete=True)
+    return checkpoint.path
+
+
+def test_resumes_only_the_same_run(tmp_path):
+    path = finished(str(tmp_path), '2026-10-15', (1, 2), ['A', 'B'])
+    assert ScanCheckpoint(path, '2026-10-15', (1, 2)).remaining(['A', 'B', 'C']) == ['C']
+
+    # Yesterday's checkpoint is removed as soon as today's shard starts
+    checkpoint = ScanCheckpoint(path, '2026-10-16', (1, 2))
+    assert checkpoint.remaining(['A', 'B', 'C']) == ['A', 'B', 'C']
+    assert not os.path.exists(path)
+
+
+def test_no_resume_discards_todays_checkpoint(tmp_path):
+    path = finished(str(tmp_path), '2026-10-16', (1, 2), ['A'])
+    assert ScanCheckpoint(path, '2026-10-16', (1, 2), resume=False).remaining(['A']) == ['A']
+    assert not os.path.exists(path)
+
+
+def test_merge_rejects_other_runs(tmp_path):
+    root = str(tmp_path)
+    paths = [finished(root, '2026-10-16', (1, 2), ['A', 'B']), finished(root, '2026-10-16', (2, 2), ['C'])]
+
+    total = merge_checkpoints(paths, '2026-10-16')
+    assert total['complete'] and total['shards'] == 2 and total['stale'] == 0
+    assert total['success'] == 3 and total['tickers'] == 3
+
+    # Shard 2 failed today before saving: only yesterday's file was uploaded
+    finished(root, '2026-10-15', (2, 2), ['C'])
+    total = merge_checkpoints(paths, '2026-10-16')
+    assert not total['complete'] and total['shards'] == 1 and total['stale'] == 1
+    assert total['success'] == 2
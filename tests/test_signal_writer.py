@@ -0,0 +1,116 @@
+"""SignalWriter against an in-memory sink: reject splitting, retries and dead-letter replay"""
+
+import os
+import time
+import json
+
+import pytest
+
+from signal_writer import SignalWriter
+
+
+class APIError(Exception):
+    """Like postgrest's APIError: the SQLSTATE is a string in .code"""
+
+    def __init__(self, code):
+        super().__init__(f"postgres error {code}")
+        self.code = code
+
+
+class IntegrityError(Exception):
+    """Stands in for psycopg.IntegrityError"""
+
+
+class MemorySink:
+    """Stores rows by key; rows with 'bad' set fail the whole request"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.rows = {}
+        self.calls = 0
+        self.closed = False
+
+    def write(self, rows):
+        self.calls += 1
+        if self.error and any(r.get('bad') for r in rows):
+            raise self.error
+        new = [r for r in rows if r['ticker'] not in self.rows]
+        self.rows.update((r['ticker'], r) for r in new)
+        return len(new)
+
+    def close(self):
+        self.closed = True
+
+
+def signals(n, bad=()):
+    return [{'ticker': f"T{i}", 'bad': i in bad} for i in range(n)]
+
+
+@pytest.mark.parametrize('error', [APIError('23505'), APIError('22P02'), IntegrityError('duplicate key')])
+def test_rejected_rows_are_isolated_without_retries(tmp_path, error):
+    sink = MemorySink(error)
+    writer = SignalWriter(sink, batch_size=16, min_batch=16, backoff=0.001,
+                          dead_letter=str(tmp_path / 'dead.jsonl'))
+    stats = writer.write(signals(16, bad={5}))
+
+    assert stats['retries'] == 0
+    assert stats['inserted'] == 15 and stats['failed'] == 1
+    with open(tmp_path / 'dead.jsonl') as f:
+        dead = [row for line in f for row in json.loads(line)['rows']]
+    assert [r['ticker'] for r in dead] == ['T5']
+    writer.close()
+    assert sink.closed
+
+
+def test_other_errors_are_retried(tmp_path):
+    sink = MemorySink(APIError('PGRST301'))
+    writer = SignalWriter(sink, batch_size=4, max_retries=2, backoff=0.001,
+                          dead_letter=str(tmp_path / 'dead.jsonl'))
+    stats = writer.write(signals(4, bad={0}))
+    writer.close()
+    assert stats['retries'] == 2 and stats['failed'] == 4
+    assert sink.calls == 3
+
+
+def test_replay_keeps_the_file_until_done(tmp_path):
+    path = str(tmp_path / 'dead.jsonl')
+    with open(path, 'w') as f:
+        f.write(json.dumps({'rows': signals(3)}) + '\n')
+
+    class Crash(Exception):
+        pass
+
+    sink = MemorySink(Crash())
+    writer = SignalWriter(sink, dead_letter=path)
+    writer.write = lambda rows: (_ for _ in ()).throw(Crash())
+    with pytest.raises(Crash):
+        writer.replay()
+    assert not os.path.exists(path) and os.path.exists(path + '.replay')
+
+    # A later failure is dead-lettered anew; the next replay sends both files
+    with open(path, 'w') as f:
+        f.write(json.dumps({'rows': signals(5)[3:]}) + '\n')
+    writer = SignalWriter(MemorySink(), dead_letter=path)
+    assert writer.replay() == 5
+    writer.close()
+    assert not os.path.exists(path) and not os.path.exists(path + '.replay')
+
+
+def test_tick_sends_a_due_batch_between_signals(tmp_path):
+    sink = MemorySink()
+    writer = SignalWriter(sink, batch_size=50, flush_seconds=0.05, dead_letter=str(tmp_path / 'dead.jsonl'))
+    seen = []
+
+    def pipeline():
+        yield {'ticker': 'T0'}
+        # A long stretch of batches with no signals, ticking after each
+        for _ in range(5):
+            time.sleep(0.02)
+            writer.tick()
+        seen.append(list(writer.batch))
+        yield {'ticker': 'T1'}
+
+    writer.write(pipeline())
+    writer.close()
+    assert seen == [[]]
+    assert set(sink.rows) == {'T0', 'T1'}
@@ -1,18 +1,29 @@
 """
 Dynamic Ticker Fetcher - Gets current US market tickers from multiple sources
-No hardcoding - always fetches fresh data
+One function per source (index constituents, exchange listings, Finviz);
+fetch_sources() runs any set of them concurrently. universe.py caches the
+result on disk and is what the worker and backtester call.
 """
 
 import pandas as pd
 import requests
 from io import StringIO
-import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Headers to prevent blocking (Wikipedia rejects the default pandas/urllib agent)
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+}
+
+def read_html(url):
+    return pd.read_html(url, storage_options={'User-Agent': HEADERS['User-Agent']})
 
 def get_sp500_tickers():
     """Fetch current S&P 500 constituents from Wikipedia"""
     try:
         url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-        tables = pd.read_html(url)
+        tables = read_html(url)
         df = tables[0]
         tickers = df['Symbol'].str.replace('.', '-', regex=False).tolist()
         print(f"✓ S&P 500: {len(tickers)} tickers")
@@ -25,7 +36,7 @@ def get_sp400_tickers():
     """Fetch current S&P 400 MidCap constituents from Wikipedia"""
     try:
         url = "https://en.wikipedia.org/wiki/List_of_S%26P_400_companies"
-        tables = pd.read_html(url)
+        tables = read_html(url)
         df = tables[0]
         # Column might be 'Symbol' or 'Ticker'
         col = 'Symbol' if 'Symbol' in df.columns else 'Ticker Symbol'
@@ -40,7 +51,7 @@ def get_sp600_tickers():
     """Fetch current S&P 600 SmallCap constituents from Wikipedia"""
     try:
         url = "https://en.wikipedia.org/wiki/List_of_S%26P_600_companies"
-        tables = pd.read_html(url)
+        tables = read_html(url)
         df = tables[0]
         col = 'Symbol' if 'Symbol' in df.columns else 'Ticker symbol'
         tickers = df[col].str.replace('.', '-', regex=False).tolist()
@@ -54,7 +65,7 @@ def get_nasdaq100_tickers():
     """Fetch current NASDAQ 100 constituents from Wikipedia"""
     try:
         url = "https://en.wikipedia.org/wiki/Nasdaq-100"
-        tables = pd.read_html(url)
+        tables = read_html(url)
         # Find the table with ticker symbols
         for table in tables:
             if 'Ticker' in table.columns or 'Symbol' in table.columns:
@@ -74,7 +85,8 @@ def get_nasdaq_traded():
     """
     try:
         url = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqtraded.txt"
-        response = requests.get(url, timeout=30)
+        response = requests.get(url, headers=HEADERS, timeout=30)
+        response.raise_for_status()
         df = pd.read_csv(StringIO(response.text), sep='|')
 
         # Filter: common stocks only, actively traded
@@ -102,7 +114,8 @@ def get_nyse_listed():
     """Fetch NYSE-listed stocks from official NASDAQ FTP"""
     try:
         url = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
-        response = requests.get(url, timeout=30)
+        response = requests.get(url, headers=HEADERS, timeout=30)
+        response.raise_for_status()
         df = pd.read_csv(StringIO(response.text), sep='|')
 
         # Filter for NYSE stocks
@@ -134,10 +147,7 @@ def get_finviz_tickers(min_price=5, min_volume=500000, min_market_cap=300):
         # cap_small = $300M-$2B, cap_mid = $2B-$10B, cap_large = $10B+
         url = f"https://finviz.com/export.ashx?v=111&f=cap_smallover,sh_avgvol_o500,sh_price_o5"
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
+        response = requests.get(url, headers=HEADERS, timeout=30)
 
         if response.status_code == 200:
             df = pd.read_csv(StringIO(response.text))
@@ -151,6 +161,28 @@ def get_finviz_tickers(min_price=5, min_volume=500000, min_market_cap=300):
         print(f"✗ Finviz fetch failed: {e}")
         return []
 
+SOURCES = {
+    'sp500': get_sp500_tickers,
+    'sp400': get_sp400_tickers,
+    'sp600': get_sp600_tickers,
+    'nasdaq100': get_nasdaq100_tickers,
+    'nasdaq_traded': get_nasdaq_traded,
+    'nyse_listed': get_nyse_listed,
+    'finviz': get_finviz_tickers,
+}
+
+def fetch_sources(names, workers=4):
+    """{source name: tickers} with every source fetched concurrently ([] when one fails)"""
+    names = list(names)
+    if not names:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(names))) as pool:
+        return dict(zip(names, pool.map(lambda name: SOURCES[name](), names)))
+
+def clean_tickers(tickers):
+    """Sorted unique 1-5 character symbols"""
+    return sorted(t for t in set(tickers) if t and isinstance(t, str) and 1 <= len(t) <= 5)
+
 def get_all_us_tickers(
     include_sp500=True,
     include_sp400=True,
@@ -161,7 +193,7 @@ def get_all_us_tickers(
     min_market_cap_millions=300
 ):
     """
-    Get comprehensive US stock ticker list from multiple sources
+    Get comprehensive US stock ticker list from multiple sources (fetched concurrently)
 
     Default settings give ~1500 quality stocks (S&P indices)
     Set include_full_market=True for full US market (5000+ stocks)
@@ -170,40 +202,16 @@ def get_all_us_tickers(
     print("Fetching current US market tickers...")
     print("=" * 50)
 
-    all_tickers = []
-
     if include_full_market:
         # Full market from official NASDAQ sources
-        all_tickers.extend(get_nasdaq_traded())
-        time.sleep(1)
-        all_tickers.extend(get_nyse_listed())
-        time.sleep(1)
+        names = ['nasdaq_traded', 'nyse_listed']
     else:
         # S&P indices for quality stocks
-        if include_sp500:
-            all_tickers.extend(get_sp500_tickers())
-            time.sleep(1)
-
-        if include_sp400:
-            all_tickers.extend(get_sp400_tickers())
-            time.sleep(1)
-
-        if include_sp600:
-            all_tickers.extend(get_sp600_tickers())
-            time.sleep(1)
-
-        if include_nasdaq100:
-            all_tickers.extend(get_nasdaq100_tickers())
-            time.sleep(1)
-
-        if include_finviz:
-            all_tickers.extend(get_finviz_tickers(min_market_cap=min_market_cap_millions))
-
-    # Deduplicate and clean
-    tickers = sorted(list(set(all_tickers)))
+        flags = {'sp500': include_sp500, 'sp400': include_sp400, 'sp600': include_sp600,
+                 'nasdaq100': include_nasdaq100, 'finviz': include_finviz}
+        names = [name for name, include in flags.items() if include]
 
-    # Remove any empty or invalid
-    tickers = [t for t in tickers if t and isinstance(t, str) and 1 <= len(t) <= 5]
+    tickers = clean_tickers(t for found in fetch_sources(names).values() for t in found)
 
     print("=" * 50)
     print(f"Total unique tickers: {len(tickers)}")
@@ -0,0 +1,158 @@
+"""
+Universe - The tickers a scan mode covers, cached on disk
+Index membership changes a few times a quarter, so each source's list is
+kept in one JSON file and only re-fetched (concurrently, via ticker_fetcher)
+once it is older than its TTL. A source that fails or comes back far smaller
+than before keeps its last good list; the hard-coded FALLBACK_TICKERS are only
+used when there has never been a good fetch. Every resolved universe is
+diffed against the previous one so membership changes show up in the logs.
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+
+from ticker_fetcher import fetch_sources, clean_tickers
+
+DAY_SECONDS = 86400
+
+# Sources per scan mode
+MODES = {
+    'fast': ('sp500',),                                             # ~500 large caps
+    'medium': ('sp500', 'sp400'),                                   # ~900 large + mid caps
+    'quality': ('sp500', 'sp400', 'sp600', 'nasdaq100', 'finviz'),  # ~1,500 liquid stocks
+    'full': ('nasdaq_traded', 'nyse_listed'),                       # ~6,000, entire US market
+}
+
+# A fresh list shorter than this fraction of the last good one is treated as a failed fetch
+MIN_SOURCE_RATIO = 0.5
+
+# Last resort if no source has ever been fetched successfully
+FALLBACK_TICKERS = [
+    # S&P 500 Large Cap
+    'AAPL', 'ABBV', 'ABT', 'ACN', 'ADBE', 'ADI', 'ADP', 'ADSK', 'AEP', 'AFL',
+    'AIG', 'AMAT', 'AMD', 'AMGN', 'AMZN', 'ANET', 'AON', 'APD', 'APH', 'AVGO',
+    'AXP', 'AZO', 'BA', 'BAC', 'BDX', 'BIIB', 'BK', 'BKNG', 'BLK', 'BMY',
+    'BRK-B', 'BSX', 'C', 'CAT', 'CB', 'CDNS', 'CEG', 'CHTR', 'CI', 'CL',
+    'CMCSA', 'CME', 'CMG', 'COF', 'COP', 'COST', 'CRM', 'CSCO', 'CSX', 'CTAS',
+    'CVS', 'CVX', 'D', 'DD', 'DE', 'DHI', 'DHR', 'DIS', 'DLR', 'DOW',
+    'DUK', 'DVN', 'DXCM', 'EA', 'EBAY', 'ECL', 'EL', 'EMR', 'ENPH', 'EOG',
+    'EQIX', 'EW', 'EXC', 'F', 'FANG', 'FAST', 'FCX', 'FDX', 'FI', 'FICO',
+    'FISV', 'FTNT', 'GD', 'GE', 'GEHC', 'GILD', 'GIS', 'GLW', 'GM', 'GOOG',
+    'GOOGL', 'GPN', 'GS', 'GWW', 'HAL', 'HD', 'HES', 'HLT', 'HON', 'HPQ',
+    'HSY', 'HUM', 'IBM', 'ICE', 'IDXX', 'INTC', 'INTU', 'ISRG', 'ITW', 'JCI',
+    'JBHT', 'JNJ', 'JPM', 'KDP', 'KEY', 'KHC', 'KLAC', 'KMB', 'KO', 'KR',
+    'LRCX', 'LEN', 'LIN', 'LLY', 'LMT', 'LOW', 'LULU', 'LVS', 'LYB', 'MA',
+    'MAR', 'MCD', 'MCHP', 'MCK', 'MCO', 'MDLZ', 'MDT', 'MET', 'META', 'MGM',
+    'MMC', 'MMM', 'MNST', 'MO', 'MPC', 'MRK', 'MRNA', 'MS', 'MSCI', 'MSFT',
+    'MSI', 'MTB', 'MU', 'NDAQ', 'NEE', 'NEM', 'NFLX', 'NKE', 'NOC', 'NOW',
+    'NSC', 'NTAP', 'NVDA', 'NVR', 'NXPI', 'O', 'ODFL', 'OKE', 'OMC', 'ON',
+    'ORCL', 'ORLY', 'OXY', 'PANW', 'PAYX', 'PCAR', 'PEG', 'PEP', 'PFE', 'PG',
+    'PGR', 'PH', 'PHM', 'PLD', 'PM', 'PNC', 'PPG', 'PRU', 'PSA', 'PSX',
+    'PXD', 'PYPL', 'QCOM', 'RCL', 'REGN', 'RF', 'RJF', 'ROK', 'ROP', 'ROST',
+    'RSG', 'RTX', 'SBUX', 'SCHW', 'SHW', 'SLB', 'SNPS', 'SO', 'SPG', 'SPGI',
+    'SRE', 'STT', 'STZ', 'SYF', 'SYK', 'SYY', 'T', 'TDG', 'TEL', 'TFC',
+    'TGT', 'TJX', 'TMO', 'TMUS', 'TRGP', 'TROW', 'TRV', 'TSCO', 'TSLA', 'TSN',
+    'TT', 'TTWO', 'TXN', 'TYL', 'UAL', 'UNH', 'UNP', 'UPS', 'URI', 'USB',
+    'V', 'VICI', 'VLO', 'VMC', 'VRSK', 'VRTX', 'VZ', 'WBA', 'WBD', 'WELL',
+    'WFC', 'WM', 'WMB', 'WMT', 'WRB', 'WST', 'XEL', 'XOM', 'XYL', 'YUM',
+    'ZBH', 'ZBRA', 'ZTS',
+    # Mid Cap Growth
+    'ABNB', 'AXON', 'BILL', 'BLDR', 'CPRT', 'CRWD', 'DASH', 'DDOG', 'DECK',
+    'DOCU', 'ENSG', 'EXAS', 'EXP', 'FND', 'GDDY', 'GNRC', 'HUBS', 'INSP',
+    'LNTH', 'MANH', 'MEDP', 'MDB', 'MPWR', 'MSTR', 'MUSA', 'NET', 'NTRA',
+    'OLED', 'ONTO', 'PCTY', 'PLTR', 'PODD', 'POOL', 'PSTG', 'RH', 'SAIA',
+    'SMCI', 'SNOW', 'SQ', 'TECH', 'TER', 'TOST', 'TPL', 'TREX', 'TTD', 'TW',
+    'UBER', 'ULTA', 'VEEV', 'WIX', 'ZS',
+    # Energy & Materials
+    'ALB', 'APA', 'AR', 'BKR', 'CF', 'CLF', 'CNX', 'CTRA', 'DVN', 'EQT',
+    'FANG', 'HAL', 'HES', 'KMI', 'MOS', 'MPC', 'MRO', 'NOV', 'NUE', 'OKE',
+    'OVV', 'OXY', 'RRC', 'SCCO', 'SLB', 'STLD', 'TRGP', 'VLO', 'WMB', 'XOM',
+    # Financials
+    'ACGL', 'AFL', 'AIG', 'ALL', 'ALLY', 'AON', 'AXP', 'BAC', 'BK', 'BLK',
+    'BRO', 'C', 'CB', 'CINF', 'CMA', 'COF', 'DFS', 'FITB', 'GS', 'HBAN',
+    'HIG', 'IBKR', 'ICE', 'JPM', 'KEY', 'L', 'MET', 'MMC', 'MS', 'MTB',
+    'NTRS', 'PFG', 'PGR', 'PNC', 'PRU', 'RF', 'RJF', 'SCHW', 'STT', 'SYF',
+    'TFC', 'TROW', 'TRV', 'USB', 'WFC', 'WRB', 'ZION',
+    # REITs
+    'AMT', 'ARE', 'AVB', 'CCI', 'DLR', 'EQIX', 'EQR', 'ESS', 'EXR', 'INVH',
+    'IRM', 'MAA', 'O', 'PLD', 'PSA', 'SBAC', 'SPG', 'UDR', 'VICI', 'WELL',
+]
+
+
+class UniverseCache:
+    """
+    {'sources':   {name: {'tickers', 'fetched_at'}},   last good list per source
+     'universes': {mode: {'tickers', 'resolved_at', 'added', 'removed'}}}
+    """
+
+    def __init__(self, path='data/universe.json', ttl_days=7):
+        self.path = path
+        self.ttl_days = ttl_days
+        self.data = {'sources': {}, 'universes': {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def expired(self, name, now):
+        entry = self.data['sources'].get(name)
+        return entry is None or now - entry['fetched_at'] > self.ttl_days * DAY_SECONDS
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+    def refresh(self, names, force=False):
+        """Re-fetch expired sources concurrently; keeps the last good list of any that fail"""
+        now = time.time()
+        stale = [n for n in names if force or self.expired(n, now)]
+        for name, tickers in fetch_sources(stale).items():
+            tickers = clean_tickers(tickers)
+            last = self.data['sources'].get(name)
+            if last and len(tickers) < MIN_SOURCE_RATIO * len(last['tickers']):
+                print(f"✗ {name}: {len(tickers)} tickers vs {len(last['tickers'])} last time - "
+                      f"keeping the list from {datetime.fromtimestamp(last['fetched_at']):%Y-%m-%d}")
+                continue
+            if not tickers:
+                continue
+            self.data['sources'][name] = {'tickers': tickers, 'fetched_at': now}
+        return stale
+
+    def resolve(self, mode):
+        """Union of the mode's cached sources, diffed against the previous universe for the mode"""
+        tickers = clean_tickers(t for n in MODES[mode] for t in self.data['sources'].get(n, {}).get('tickers', []))
+        previous = self.data['universes'].get(mode)
+        if previous and tickers != previous['tickers']:
+            old, new = set(previous['tickers']), set(tickers)
+            self.data['universes'][mode] = {'tickers': tickers, 'resolved_at': time.time(),
+                                            'added': sorted(new - old), 'removed': sorted(old - new)}
+            print(f"Universe '{mode}' changed since {datetime.fromtimestamp(previous['resolved_at']):%Y-%m-%d}: "
+                  f"+{len(new - old)} {sorted(new - old)[:10]}, -{len(old - new)} {sorted(old - new)[:10]}")
+        elif previous is None:
+            self.data['universes'][mode] = {'tickers': tickers, 'resolved_at': time.time(), 'added': [], 'removed': []}
+        return tickers
+
+
+def load_universe(mode='medium', path='data/universe.json', ttl_days=7, refresh=False):
+    """
+    Tickers for a scan mode ('fast', 'medium', 'quality' or 'full'). Served
+    from the cache while every source is younger than ttl_days; refresh=True
+    re-fetches them all.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown universe mode: {mode} (choose from {sorted(MODES)})")
+    cache = UniverseCache(path, ttl_days)
+    fetched = cache.refresh(MODES[mode], force=refresh)
+    tickers = cache.resolve(mode)
+    cache.save()
+
+    if not tickers:
+        print(f"⚠️ No ticker source available, using fallback list ({len(set(FALLBACK_TICKERS))} stocks)")
+        return sorted(set(FALLBACK_TICKERS))
+    source = 'fetched' if fetched else 'cached'
+    print(f"Universe '{mode}': {len(tickers)} tickers ({source}{': ' + ', '.join(fetched) if fetched else ''})")
+    return tickers
@@ -0,0 +1,252 @@
+"""
+Walk Forward - Rolling in-sample optimisation with out-of-sample testing
+Thresholds are picked on each training window (e.g. 2019-2021) and then
+traded unchanged on the following test window (2022), rolling forward a
+year at a time. The out-of-sample trades of all windows are stitched
+together and compared with SPY over the same test periods.
+
+Prices and indicators are loaded once into an in-memory cube (one entry
+per ticker, indicators computed over dates x tickers panels) and shared by
+every window. Training only sees bars before
+the end of its window; test trades may run past the window end to their
+real exit. Windows run in parallel on forked processes, which share the
+cube without copying; where fork is unavailable they run in sequence.
+
+The universe is the stored tickers that pass the fundamentals gate, as in
+backtest_vs_spy and sweep; SPY is only the benchmark.
+
+Usage: python walk_forward.py   (grid from sweep.GRID)
+"""
+
+import os
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from price_store import PriceStore
+from calendar_index import to_day
+from exit_engine import simulate_exits, EXIT_REASONS, STILL_OPEN
+from backtest_runner import ticker_arrays, panel_arrays, window, stored_tickers, gate_fundamentals
+from strategy import FundamentalConfig
+from fundamentals_cache import FundamentalsCache
+from sweep import GRID, STAT_COLUMNS, expand_grid, combo_entries, combo_stats, position_size, results_table
+
+START_DATE = '2019-01-01'
+PRICE_STORE_DIR = 'data/prices'
+FUNDAMENTALS_PATH = 'data/fundamentals.json'
+FUNDAMENTALS_TTL_DAYS = 7
+TRAIN_YEARS = 3
+TEST_YEARS = 1
+
+# Training picks the combination with the highest value of this results_table column
+OBJECTIVE = 'total_pnl'
+MIN_TRAIN_TRADES = 30
+
+# Tickers per dates x tickers indicator panel while building the cube
+PANEL_TICKERS = 500
+
+_shared = {}
+
+
+def make_windows(start_date, end_date, train_years=TRAIN_YEARS, test_years=TEST_YEARS):
+    """[(train_start, train_end, test_start, test_end)] date strings, rolling by test_years"""
+    first, last = pd.Timestamp(start_date).year, pd.Timestamp(end_date)
+    windows = []
+    year = first
+    while pd.Timestamp(f"{year + train_years}-01-01") < last:
+        test_start = f"{year + train_years}-01-01"
+        test_end = min(pd.Timestamp(f"{year + train_years + test_years}-01-01"), last).strftime('%Y-%m-%d')
+        windows.append((f"{year}-01-01", test_start, test_start, test_end))
+        year += test_years
+    return windows
+
+
+def build_cube(tickers, store_root, vix_days, vix_close, start_date, end_date, min_bars=500,
+               sma_slope_days=20, volume_avg_days=50):
+    """
+    {ticker: (days, high, low, mask arrays)} for every ticker with enough
+    stored bars, indicators computed PANEL_TICKERS tickers per panel. Tickers
+    that fail are printed and counted, not traded.
+    """
+    store = PriceStore(store_root)
+    start_day, end_day = to_day(start_date), to_day(end_date)
+    cube, counts = {}, {}
+
+    def count(status):
+        counts[status] = counts.get(status, 0) + 1
+
+    for c in range(0, len(tickers), PANEL_TICKERS):
+        recs = {}
+        for ticker in tickers[c:c + PANEL_TICKERS]:
+            try:
+                rec = window(store.read(ticker), start_day, end_day, min_bars)
+                if rec is None:
+                    count('no_data')
+                else:
+                    recs[ticker] = rec
+            except Exception as e:
+                print(f"  {ticker}: {type(e).__name__}: {e}")
+                count('error')
+        if not recs:
+            continue
+
+        # Indicators for the whole chunk in one dates x tickers pass
+        try:
+            arrays = panel_arrays(recs, vix_days, vix_close, sma_slope_days, volume_avg_days)
+        except Exception as e:
+            print(f"  Panel of {len(recs)} tickers failed ({type(e).__name__}: {e}), computing one at a time")
+            arrays = {}
+        for ticker, rec in recs.items():
+            try:
+                high, low, a = arrays.get(ticker) or ticker_arrays(rec, vix_days, vix_close, sma_slope_days,
+                                                                   volume_avg_days)
+                cube[ticker] = (np.array(rec['day']), high, low, a)
+                count('success')
+            except Exception as e:
+                print(f"  {ticker}: {type(e).__name__}: {e}")
+                count('error')
+    print(f"Cube tickers: {counts}")
+    return cube
+
+
+def run_window(win, cube, combos, sizing=(100000, 1.0, 15.0), objective=OBJECTIVE, min_trades=MIN_TRAIN_TRADES):
+    """Optimise on the training part of `win`, then trade the winner on its test part"""
+    train_lo, train_hi, test_lo, test_hi = (to_day(d) for d in win)
+
+    # In-sample: arrays cut at the end of training so no later bar is seen
+    totals = np.zeros((len(combos), len(STAT_COLUMNS)))
+    for days, high, low, a in cube.values():
+        lo, hi = np.searchsorted(days, [train_lo, train_hi])
+        if hi <= lo:
+            continue
+        cut = {k: v[:hi] if isinstance(v, np.ndarray) else v for k, v in a.items()}
+        totals += combo_stats(high[:hi], low[:hi], cut, combos, sizing, lo)
+    table = results_table(combos, totals)
+    eligible = table[table['closed'] >= min_trades]
+    best = (eligible if len(eligible) else table)[objective].fillna(-np.inf).idxmax()
+    params, signal_cfg, exit_cfg = combos[best]
+
+    # Out-of-sample: entries inside the test window, exits wherever they happen
+    position = position_size(exit_cfg, sizing)
+    trades = []
+    for ticker, (days, high, low, a) in cube.items():
+        lo, hi = np.searchsorted(days, [test_lo, test_hi])
+        if hi <= lo:
+            continue
+        entries = combo_entries(a, signal_cfg, lo=lo, hi=hi)
+        if len(entries) == 0:
+            continue
+        exits = simulate_exits(a['close'], high, low, entries, exit_cfg)
+        for j, i in enumerate(entries):
+            exit_idx = exits['exit_idx'][j]
+            trades.append({
+                'test_start': win[2],
+                'ticker': ticker,
+                'entry_date': int(days[i]),
+                'exit_date': int(days[exit_idx]) if exit_idx >= 0 else None,
+                'return_pct': round(exits['return_pct'][j], 2),
+                'exit_reason': EXIT_REASONS[exits['reason'][j]],
+                'pnl': round(position * exits['return_pct'][j] / 100, 0),
+            })
+
+    return {'window': win, 'params': params, 'in_sample': table.loc[best].to_dict(), 'trades': trades}
+
+
+def _window_task(win):
+    s = _shared
+    return run_window(win, s['cube'], s['combos'], s['sizing'], s['objective'], s['min_trades'])
+
+
+def period_return(days, close, start_date, end_date):
+    """Buy & hold % return from the first close on/after start_date to the last before end_date"""
+    lo, hi = np.searchsorted(days, [to_day(start_date), to_day(end_date)])
+    if hi - lo < 2:
+        return 0.0
+    return (close[hi - 1] - close[lo]) / close[lo] * 100
+
+
+def walk_forward(grid, cube, windows, spy_days, spy_close, base_signal=None, base_exit=None,
+                 sizing=(100000, 1.0, 15.0), objective=OBJECTIVE, min_trades=MIN_TRAIN_TRADES, workers=None):
+    """
+    Returns (windows table, out-of-sample trades, summary dict).
+    The windows table has one row per window: chosen parameters, in-sample
+    stats, out-of-sample stats and SPY's return over the test period.
+    """
+    combos = expand_grid(grid, base_signal, base_exit)
+    workers = min(workers or os.cpu_count() or 1, len(windows))
+
+    if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        _shared.update(cube=cube, combos=combos, sizing=sizing, objective=objective, min_trades=min_trades)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            results = list(pool.map(_window_task, windows))
+        _shared.clear()
+    else:
+        results = [run_window(w, cube, combos, sizing, objective, min_trades) for w in windows]
+
+    capital = sizing[0]
+    rows, all_trades = [], []
+    for r in results:
+        train_start, train_end, test_start, test_end = r['window']
+        trades = pd.DataFrame(r['trades'], columns=['test_start', 'ticker', 'entry_date', 'exit_date',
+                                                    'return_pct', 'exit_reason', 'pnl'])
+        closed = trades[trades['exit_reason'] != EXIT_REASONS[STILL_OPEN]]
+        wins = closed['return_pct'] > 0
+        losses = closed['return_pct'][~wins].sum()
+        rows.append({
+            'train': f"{train_start}..{train_end}",
+            'test': f"{test_start}..{test_end}",
+            **r['params'],
+            'is_pnl': r['in_sample']['total_pnl'],
+            'is_win_rate': r['in_sample']['win_rate'],
+            'oos_trades': len(trades),
+            'oos_win_rate': wins.mean() * 100 if len(closed) else np.nan,
+            'oos_profit_factor': closed['return_pct'][wins].sum() / abs(losses) if losses else np.nan,
+            'oos_pnl': trades['pnl'].sum(),
+            'oos_return_pct': trades['pnl'].sum() / capital * 100,
+            'spy_return_pct': period_return(spy_days, spy_close, test_start, test_end),
+        })
+        all_trades.append(trades)
+
+    table = pd.DataFrame(rows)
+    trades = pd.concat(all_trades, ignore_index=True) if all_trades else pd.DataFrame()
+    if len(trades):
+        trades['entry_date'] = pd.to_datetime(trades['entry_date'], unit='D')
+        trades['exit_date'] = pd.to_datetime(trades['exit_date'], unit='D')
+
+    summary = {
+        'windows': len(table),
+        'oos_trades': int(table['oos_trades'].sum()) if len(table) else 0,
+        'oos_pnl': float(table['oos_pnl'].sum()) if len(table) else 0.0,
+        'oos_return_pct': float(table['oos_pnl'].sum() / capital * 100) if len(table) else 0.0,
+        'spy_return_pct': float((np.prod(1 + table['spy_return_pct'] / 100) - 1) * 100) if len(table) else 0.0,
+    }
+    return table, trades, summary
+
+
+if __name__ == '__main__':
+    from datetime import datetime
+    from data_source import YahooSource
+
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    store = PriceStore(PRICE_STORE_DIR)
+    store.update(['^VIX', 'SPY'], START_DATE, end_date)
+    vix, spy = store.read('^VIX'), store.read('SPY')
+
+    print("Checking fundamentals...")
+    fundamentals = FundamentalsCache(FUNDAMENTALS_PATH, FUNDAMENTALS_TTL_DAYS)
+    tickers = list(gate_fundamentals(stored_tickers(store), fundamentals, YahooSource().infos, FundamentalConfig()))
+
+    print(f"Loading {len(tickers)} stored tickers...")
+    cube = build_cube(tickers, PRICE_STORE_DIR, vix['day'], vix['close'], START_DATE, end_date)
+    windows = make_windows(START_DATE, end_date)
+    print(f"Walk-forward: {len(windows)} windows x {len(expand_grid(GRID))} combinations over {len(cube)} tickers")
+
+    table, trades, summary = walk_forward(GRID, cube, windows, spy['day'], spy['close'])
+    table.to_csv('walk_forward_windows.csv', index=False)
+    trades.to_csv('walk_forward_trades.csv', index=False)
+
+    print(table.to_string(index=False))
+    print(f"\nOut-of-sample: {summary['oos_trades']} trades, P&L ${summary['oos_pnl']:+,.0f} "
+          f"({summary['oos_return_pct']:+.1f}%) vs SPY {summary['spy_return_pct']:+.1f}%")
+    print("Results saved to walk_forward_windows.csv and walk_forward_trades.csv")
@@ -4,42 +4,57 @@ Runs via GitHub Actions, pushes signals to Supabase
 """
 
 import os
-import pandas as pd
+import sys
+import argparse
 import numpy as np
-import yfinance as yf
 import time
 from datetime import datetime, timedelta
-from supabase import create_client, Client
 import warnings
 warnings.filterwarnings('ignore')
 
+# Shared modules (ticker_fetcher, price_store, ...) live in the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from price_store import PriceStore
+from calendar_index import to_day, from_day, to_days, align
+from data_source import YahooSource, make_source
+from strategy import StrategyConfig, FundamentalConfig, signal_mask, in_vix_zone, fundamentals_gate
+from indicator_state import IndicatorStateStore
+from fundamentals_cache import FundamentalsCache
+from signal_writer import SignalWriter, SupabaseSink, PostgresSink
+from fetch_engine import prefetch, batched
+from universe import load_universe
+from scan_checkpoint import ScanCheckpoint, parse_shard, shard_tickers, checkpoint_path, merge_checkpoints
+
 # =============================================================================
 # SUPABASE CONFIG
 # =============================================================================
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_KEY = os.environ.get('SUPABASE_SERVICE_KEY')  # Use service key for writes
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Missing SUPABASE_URL or SUPABASE_SERVICE_KEY environment variables")
+# DRY_RUN=1 scans without reading or writing Supabase (e.g. with DATA_SOURCE=synthetic)
+DRY_RUN = os.environ.get('DRY_RUN', '') == '1'
+
+_supabase = None
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def get_supabase():
+    """Supabase client, created on first use; None in a dry run"""
+    global _supabase
+    if DRY_RUN:
+        return None
+    if _supabase is None:
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise ValueError("Missing SUPABASE_URL or SUPABASE_SERVICE_KEY environment variables")
+        from supabase import create_client
+        _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase
 
 # =============================================================================
 # SCREENER CONFIG
 # =============================================================================
-STOP_LOSS_PCT = 15.0
-TAKE_PROFIT_PCT = 50.0
-USE_TRAILING = True
-TRAIL_ACTIVATION_PCT = 15.0
-TRAIL_DISTANCE_PCT = 10.0
-MAX_HOLD_DAYS = 120
-
-USE_VIX_FILTER = True
-VIX_MIN = 20
-VIX_MAX = 35  # Optimized for crash protection
-
-USE_VOLUME_FILTER = True
-VOLUME_SURGE_MULT = 1.2
+# Entry rules and fundamentals gate; defaults live in strategy.py and are
+# shared with the backtester, so live signals match backtested ones
+SIGNAL_CONFIG = StrategyConfig()
+FUNDAMENTAL_CONFIG = FundamentalConfig()
 
 ACCOUNT_SIZE = 100000
 RISK_PER_TRADE_PCT = 1.0
@@ -47,362 +62,423 @@ RISK_PER_TRADE_PCT = 1.0
 # Lookback for new signals (only scan recent data)
 LOOKBACK_DAYS = 30
 
-# Technical parameters
-MIN_MARKET_CAP = 1e9
-MIN_BARS = 260
-RSI_OVERSOLD = 35
-RSI_SIGNAL = 45
-RSI_LOOKBACK = 5
-ADX_MIN = 18
-MIN_BELOW_HIGH_PCT = 20.0
-MAX_BELOW_HIGH_PCT = 55.0
-MAX_FROM_SMA_PCT = 15.0
-SMA_SLOPE_DAYS = 20
-VOLUME_AVG_DAYS = 50
-MIN_GAP_DAYS = 20
-MAX_POSITION_PCT = 15.0
+# Rows per request when reading stored signal keys (PostgREST's default max-rows)
+SIGNALS_PAGE_SIZE = 1000
 
-# Fundamental filters
-USE_FUNDAMENTAL_FILTER = True
-MAX_PE_RATIO = 30
-PE_PREFER_BELOW = 20
-MAX_PEG_RATIO = 2.0
-MAX_PRICE_TO_BOOK = 5.0
-MIN_ROE = 8.0
-MAX_DEBT_EQUITY = 2.0
-REQUIRE_POSITIVE_FCF = True
+# Universe: 'medium' = S&P 500 + 400, 'full' = entire US market (ticker_fetcher)
+SCAN_MODE = os.environ.get('SCAN_MODE', 'medium')
 
-# =============================================================================
-# DYNAMIC TICKER FETCHING
-# =============================================================================
-import requests
-from io import StringIO
+# Price downloads: tickers per multi-ticker yf.download request
+DOWNLOAD_BATCH_SIZE = 100
 
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-}
+# Market data: 'yahoo', 'cache' (local store only) or 'synthetic' (generated, offline).
+# Synthetic data is kept under its own directory so it never mixes with real history.
+DATA_SOURCE = os.environ.get('DATA_SOURCE', 'yahoo')
+DATA_DIR = 'data/synthetic' if DATA_SOURCE == 'synthetic' else 'data'
 
-def get_sp500_tickers():
-    try:
-        url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-        tables = pd.read_html(url, storage_options={'User-Agent': HEADERS['User-Agent']})
-        tickers = tables[0]['Symbol'].str.replace('.', '-', regex=False).tolist()
-        print(f"✓ S&P 500: {len(tickers)} tickers")
-        return tickers
-    except Exception as e:
-        print(f"✗ S&P 500 failed: {e}")
-        return []
+# Price history window. 365 calendar days is only ~250 bars, short of MIN_BARS
+HISTORY_DAYS = 400
 
-def get_sp400_tickers():
-    try:
-        url = "https://en.wikipedia.org/wiki/List_of_S%26P_400_companies"
-        tables = pd.read_html(url, storage_options={'User-Agent': HEADERS['User-Agent']})
-        df = tables[0]
-        col = 'Symbol' if 'Symbol' in df.columns else 'Ticker Symbol'
-        tickers = df[col].str.replace('.', '-', regex=False).tolist()
-        print(f"✓ S&P 400: {len(tickers)} tickers")
-        return tickers
-    except Exception as e:
-        print(f"✗ S&P 400 failed: {e}")
-        return []
-
-def get_tickers():
-    print("Fetching tickers...")
-    all_tickers = []
-    all_tickers.extend(get_sp500_tickers())
-    time.sleep(0.5)
-    all_tickers.extend(get_sp400_tickers())
-    tickers = sorted(list(set(all_tickers)))
-    tickers = [t for t in tickers if t and isinstance(t, str) and 1 <= len(t) <= 5]
-    print(f"Total: {len(tickers)} tickers")
-    return tickers
-
-TICKERS = get_tickers()
-
-# Fallback if fetching fails
-if len(TICKERS) < 100:
-    print("Using fallback ticker list...")
-    TICKERS = [
-        'AAPL', 'ABBV', 'ABT', 'ACN', 'ADBE', 'ADP', 'AMAT', 'AMD', 'AMGN', 'AMZN',
-        'AVGO', 'AXP', 'BA', 'BAC', 'BK', 'BKNG', 'BLK', 'BMY', 'BRK-B', 'C',
-        'CAT', 'CHTR', 'CL', 'CMCSA', 'COF', 'COP', 'COST', 'CRM', 'CSCO', 'CVS',
-        'CVX', 'DE', 'DHR', 'DIS', 'DOW', 'DUK', 'EMR', 'EXC', 'F', 'FDX',
-        'GD', 'GE', 'GILD', 'GM', 'GOOG', 'GOOGL', 'GS', 'HD', 'HON', 'IBM',
-        'INTC', 'INTU', 'ISRG', 'JNJ', 'JPM', 'KO', 'LIN', 'LLY', 'LMT', 'LOW',
-        'MA', 'MCD', 'MDLZ', 'MDT', 'MET', 'META', 'MMM', 'MO', 'MRK', 'MS',
-        'MSFT', 'NEE', 'NFLX', 'NKE', 'NOW', 'NVDA', 'ORCL', 'PEP', 'PFE', 'PG',
-        'PM', 'PYPL', 'QCOM', 'RTX', 'SBUX', 'SCHW', 'SO', 'SPG', 'T', 'TGT',
-        'TMO', 'TMUS', 'TSLA', 'TXN', 'UNH', 'UNP', 'UPS', 'USB', 'V', 'VZ',
-        'WFC', 'WMT', 'XOM',
-    ]
+# Local price history; only missing tail bars are downloaded each run
+PRICE_STORE_DIR = os.environ.get('PRICE_STORE_DIR', f'{DATA_DIR}/prices')
 
-# =============================================================================
-# INDICATORS
-# =============================================================================
-def calc_rsi(close, length=14):
-    delta = close.diff()
-    gain = delta.where(delta > 0, 0.0)
-    loss = (-delta).where(delta < 0, 0.0)
-    avg_gain = gain.ewm(alpha=1/length, min_periods=length, adjust=False).mean()
-    avg_loss = loss.ewm(alpha=1/length, min_periods=length, adjust=False).mean()
-    rs = avg_gain / avg_loss.replace(0, np.nan)
-    return (100.0 - (100.0 / (1.0 + rs))).fillna(50)
-
-def calc_adx(high, low, close, length=14):
-    prev_close = close.shift(1)
-    tr = pd.concat([high - low, (high - prev_close).abs(), (low - prev_close).abs()], axis=1).max(axis=1)
-    up_move = high - high.shift(1)
-    down_move = low.shift(1) - low
-    plus_dm = pd.Series(np.where((up_move > down_move) & (up_move > 0), up_move, 0), index=high.index)
-    minus_dm = pd.Series(np.where((down_move > up_move) & (down_move > 0), down_move, 0), index=high.index)
-    atr = tr.ewm(alpha=1/length, min_periods=length, adjust=False).mean()
-    plus_di = 100 * plus_dm.ewm(alpha=1/length, min_periods=length, adjust=False).mean() / atr.replace(0, np.nan)
-    minus_di = 100 * minus_dm.ewm(alpha=1/length, min_periods=length, adjust=False).mean() / atr.replace(0, np.nan)
-    dx = 100 * (plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, np.nan)
-    adx = dx.ewm(alpha=1/length, min_periods=length, adjust=False).mean()
-    return adx.fillna(0), plus_di.fillna(0), minus_di.fillna(0)
+# Per-ticker indicator accumulators (one file each), updated with only the new bars each run
+INDICATOR_STATE_PATH = os.environ.get('INDICATOR_STATE_PATH', f'{DATA_DIR}/indicator_state')
 
-# =============================================================================
-# FUNDAMENTAL CHECK
-# =============================================================================
-def check_fundamentals(info):
-    if not USE_FUNDAMENTAL_FILTER:
-        return True, 10, {}
-
-    score = 0
-    details = {}
-
-    pe = info.get('forwardPE') or info.get('trailingPE')
-    if pe and pe > 0:
-        details['pe'] = pe
-        if pe <= PE_PREFER_BELOW:
-            score += 3
-        elif pe <= MAX_PE_RATIO:
-            score += 1
-
-    peg = info.get('pegRatio')
-    if peg and peg > 0:
-        details['peg'] = peg
-        if peg < 1:
-            score += 3
-        elif peg <= MAX_PEG_RATIO:
-            score += 1
-
-    pb = info.get('priceToBook')
-    if pb and pb > 0:
-        details['pb'] = pb
-        if pb < 2:
-            score += 2
-        elif pb <= MAX_PRICE_TO_BOOK:
-            score += 1
-
-    roe = info.get('returnOnEquity')
-    if roe:
-        roe_pct = roe * 100
-        details['roe'] = roe_pct
-        if roe_pct >= 15:
-            score += 3
-        elif roe_pct >= MIN_ROE:
-            score += 1
-
-    de = info.get('debtToEquity')
-    if de:
-        de_ratio = de / 100 if de > 10 else de
-        details['de'] = de_ratio
-        if de_ratio < 0.5:
-            score += 2
-        elif de_ratio <= MAX_DEBT_EQUITY:
-            score += 1
-
-    fcf = info.get('freeCashflow')
-    if fcf:
-        details['fcf'] = fcf
-        if fcf > 0:
-            score += 2
-        elif REQUIRE_POSITIVE_FCF:
-            score -= 2
-
-    eg = info.get('earningsGrowth')
-    if eg and eg > 0:
-        details['earnings_growth'] = eg * 100
-        if eg > 0.20:
-            score += 2
-        elif eg > 0:
-            score += 1
-
-    passed = score >= 5
-    details['score'] = score
-
-    return passed, score, details
+# Fundamentals (.info) cache: fields change at most quarterly
+FUNDAMENTALS_PATH = os.environ.get('FUNDAMENTALS_PATH', f'{DATA_DIR}/fundamentals.json')
+FUNDAMENTALS_TTL_DAYS = 7
+FUNDAMENTALS_MAX_REFRESH = 200  # expired tickers re-fetched per run
+FUNDAMENTALS_BATCH = 25         # technical candidates per .info fetch round
 
-# =============================================================================
-# SCANNER (simplified for live signals)
-# =============================================================================
-def scan_for_live_signals():
-    """Scan for new signals in the last LOOKBACK_DAYS"""
+# Resolved ticker lists per source; re-fetched once older than UNIVERSE_TTL_DAYS
+UNIVERSE_PATH = os.environ.get('UNIVERSE_PATH', f'{DATA_DIR}/universe.json')
+UNIVERSE_TTL_DAYS = 7
 
-    end_date = datetime.now().strftime('%Y-%m-%d')
-    start_date = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
-    lookback_start = (datetime.now() - timedelta(days=LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+# Network fetches: worker threads and requests/second to Yahoo, and how many
+# price batches may be downloaded ahead of the screening stage
+FETCH_WORKERS = int(os.environ.get('FETCH_WORKERS', 8))
+FETCH_RATE = float(os.environ.get('FETCH_RATE', 5.0))
+FETCH_AHEAD = 2
 
-    # Get VIX
-    print("Downloading VIX data...")
-    vix = yf.download('^VIX', start=start_date, end=end_date, progress=False)
-    if isinstance(vix.columns, pd.MultiIndex):
-        vix.columns = [col[0] for col in vix.columns]
-    vix_lookup = {date.strftime('%Y-%m-%d'): float(row['Close']) for date, row in vix.iterrows()}
+# Checkpoints of a day's scan (one file per shard) so a cut-off run resumes;
+# saved at most every CHECKPOINT_SECONDS. MAX_RUN_MINUTES stops taking new
+# batches in time to save one before the job's own timeout
+CHECKPOINT_DIR = os.environ.get('CHECKPOINT_DIR', f'{DATA_DIR}/checkpoints')
+CHECKPOINT_SECONDS = 60
+MAX_RUN_MINUTES = float(os.environ['MAX_RUN_MINUTES']) if os.environ.get('MAX_RUN_MINUTES') else None
 
-    # Get existing signals from Supabase to avoid duplicates
-    existing = supabase.table('signals').select('ticker, signal_date').execute()
-    existing_keys = set()
-    for row in existing.data:
-        existing_keys.add(f"{row['ticker']}_{row['signal_date']}")
+# Signal writes: starting batch size, concurrent requests, and where batches
+# that keep failing are kept for the next run. SIGNALS_DSN (postgresql://...)
+# writes to a plain Postgres instead of Supabase, e.g. a local one for load tests
+WRITE_BATCH_SIZE = 50
+WRITE_IN_FLIGHT = 4
+DEAD_LETTER_PATH = os.environ.get('DEAD_LETTER_PATH', f'{DATA_DIR}/dead_letter_signals.jsonl')
+SIGNALS_DSN = os.environ.get('SIGNALS_DSN')
 
-    print(f"Existing signals in DB: {len(existing_keys)}")
-    print(f"Scanning {len(TICKERS)} tickers...")
+# Technical parameters
+MIN_BARS = 260
+SMA_SLOPE_DAYS = 20
+VOLUME_AVG_DAYS = 50
+MAX_POSITION_PCT = 15.0
 
-    new_signals = []
-    stats = {'success': 0, 'skipped': 0, 'error': 0}
+# =============================================================================
+# DATA SOURCE (universe cached on disk by universe.py)
+# =============================================================================
+def make_data_source():
+    if DATA_SOURCE == 'yahoo':
+        return YahooSource(FETCH_WORKERS, FETCH_RATE,
+                           universe=lambda mode: load_universe(mode, UNIVERSE_PATH, UNIVERSE_TTL_DAYS))
+    if DATA_SOURCE == 'cache':
+        return make_source('cache', store_root=PRICE_STORE_DIR, fundamentals_path=FUNDAMENTALS_PATH)
+    return make_source(DATA_SOURCE, end_date=datetime.now().strftime('%Y-%m-%d'))
 
-    for i, ticker in enumerate(TICKERS):
-        if (i + 1) % 50 == 0:
-            print(f"  [{i+1}/{len(TICKERS)}] New signals: {len(new_signals)}")
+# =============================================================================
+# VIX HISTORY (incremental, kept in the vix_history table)
+# =============================================================================
+def is_buy_zone(vix_close):
+    return in_vix_zone(vix_close, SIGNAL_CONFIG)
+
+def load_vix_history(start_date, end_date, source):
+    """
+    VIX closes since start_date as date-sorted arrays (epoch days, closes).
+    Reads vix_history and downloads only the days after its last row
+    (everything when the table does not reach back to start_date).
+    """
+    db = get_supabase()
+    try:
+        rows = (db.table('vix_history').select('date, close_value')
+                .gte('date', start_date).order('date').execute().data) if db else []
+    except Exception as e:
+        print(f"Could not read vix_history: {e}")
+        rows = []
+    days = to_days([r['date'] for r in rows])
+    closes = np.array([r['close_value'] for r in rows], dtype=np.float64)
+
+    # A week of slack for weekends/holidays at the start of the window
+    if len(days) and days[0] <= to_day(start_date) + 7:
+        fetch_from = from_day(days[-1] + 1)
+    else:
+        days, closes = days[:0], closes[:0]
+        fetch_from = start_date
+
+    if fetch_from < end_date:
+        print(f"Downloading VIX data from {fetch_from}...")
+        new_days, new_closes = source.vix(fetch_from, end_date)
+        new_closes = new_closes.round(2)  # as stored in close_value
+        keep = new_days > (days[-1] if len(days) else -1)
+        new_days, new_closes = new_days[keep], new_closes[keep]
+        if len(new_days):
+            rows = [{'date': from_day(d), 'close_value': float(c), 'is_buy_zone': bool(z)}
+                    for d, c, z in zip(new_days, new_closes, is_buy_zone(new_closes))]
+            try:
+                if db:
+                    db.table('vix_history').upsert(rows).execute()
+            except Exception as e:
+                print(f"Could not store VIX history: {e}")
+            days = np.concatenate([days, new_days])
+            closes = np.concatenate([closes, new_closes])
+
+    print(f"VIX history: {len(days)} days, last {from_day(days[-1]) if len(days) else 'n/a'}")
+    return days, closes
 
+# =============================================================================
+# SCANNER (staged: VIX gate -> technicals -> fundamentals)
+# =============================================================================
+def screen_ticker(state, vix_days, vix_close):
+    """Entry mask over a ticker's recent indicator rows"""
+    tail, first_bar = state.tail_arrays()
+    vix = align(vix_days, vix_close, tail['day'], 15.0)
+    mask = signal_mask(tail['close'], tail['volume'], tail['rsi'], tail['adx'], tail['sma_200'], tail['sma_slope'],
+                       tail['high_52w'], tail['vol_avg'], vix, SIGNAL_CONFIG, first_bar)
+
+    # Only report recent dates
+    mask[:max(len(mask) - LOOKBACK_DAYS, 0)] = False
+    return tail, vix, mask
+
+def build_signal(ticker, i, tail, vix, info, fund_score, fund_details):
+    price = tail['close'][i]
+    pct_below = (tail['high_52w'][i] - price) / tail['high_52w'][i] * 100
+    return {
+        'ticker': ticker,
+        'signal_date': from_day(tail['day'][i]),
+        'entry_price': round(float(price), 2),
+        'vix': round(float(vix[i]), 1),
+        'rsi': round(float(tail['rsi'][i]), 1),
+        'adx': round(float(tail['adx'][i]), 1),
+        'pct_below_high': round(float(pct_below), 1),
+        'sector': info.get('sector', 'Unknown'),
+        'pe_ratio': round(float(fund_details.get('pe', 0)), 2) if fund_details.get('pe') else None,
+        'peg_ratio': round(float(fund_details.get('peg', 0)), 2) if fund_details.get('peg') else None,
+        'roe': round(float(fund_details.get('roe', 0)), 1) if fund_details.get('roe') else None,
+        'debt_equity': round(float(fund_details.get('de', 0)), 2) if fund_details.get('de') else None,
+        'fund_score': fund_score,
+        'status': 'active',
+    }
+
+def load_existing_keys(db, since_date):
+    """
+    {(ticker, epoch day)} of stored signals dated since_date, read in pages of
+    SIGNALS_PAGE_SIZE so PostgREST's row limit never truncates the result.
+    The (ticker, signal_date) unique key still drops anything missed here.
+    """
+    keys = set()
+    if db is None:
+        return keys
+    lo = 0
+    while True:
+        rows = (db.table('signals').select('ticker, signal_date').gte('signal_date', since_date)
+                .order('signal_date').order('ticker').range(lo, lo + SIGNALS_PAGE_SIZE - 1).execute().data)
+        keys.update(zip([r['ticker'] for r in rows], to_days([r['signal_date'] for r in rows]).tolist()))
+        if len(rows) < SIGNALS_PAGE_SIZE:
+            return keys
+        lo += SIGNALS_PAGE_SIZE
+
+def vix_gate(vix_close):
+    """Stage 1: number of days in the lookback window inside the VIX buy zone"""
+    if not SIGNAL_CONFIG.use_vix_filter:
+        return LOOKBACK_DAYS
+    return int(is_buy_zone(vix_close[-LOOKBACK_DAYS:]).sum())
+
+def fetch_prices(tickers, store, download, stats, stage, deadline=None):
+    """Stage 2a: bring each batch of tickers up to date in the price store; yields the batches until `deadline`"""
+    start_date = (datetime.now() - timedelta(days=HISTORY_DAYS)).strftime('%Y-%m-%d')
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    store_stats = {'cached': 0, 'appended': 0, 'full': 0, 'empty': 0}
+
+    for i, batch in enumerate(batched(tickers, DOWNLOAD_BATCH_SIZE)):
+        if deadline and time.time() > deadline:
+            print("  Run time budget reached - stopping before the next batch")
+            stats['stopped'] = True
+            break
+        t = time.time()
         try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-
-            if (info.get('marketCap', 0) or 0) < MIN_MARKET_CAP:
-                stats['skipped'] += 1
-                continue
-
-            passed_fundamentals, fund_score, fund_details = check_fundamentals(info)
-            if not passed_fundamentals:
-                stats['skipped'] += 1
+            # SPY and ^VIX ride along with the first batch only
+            for k, v in store.update(batch, start_date, end_date, download, DOWNLOAD_BATCH_SIZE,
+                                     benchmarks=i == 0).items():
+                store_stats[k] += v
+        except Exception as e:
+            print(f"  Batch download failed: {e}")
+            stats['error'] += len(batch)
+            continue
+        finally:
+            stage['seconds'] += time.time() - t
+        stage['out'] += len(batch)
+        yield batch
+
+    print(f"Price store: {store_stats}")
+
+def screen_technicals(batches, vix_days, vix_close, existing_keys, store, states, stats, stage, checkpoint=None,
+                      on_batch=None):
+    """Stage 2b: indicators + entry mask per ticker; yields (ticker, rows, tail, vix) for new setups"""
+    bars_applied = 0
+    for batch in batches:
+        t = time.time()
+        found = []
+        for ticker in batch:
+            try:
+                rec = store.read(ticker)
+                if rec is None or len(rec) < MIN_BARS:
+                    stats['skipped'] += 1
+                    continue
+                state, applied = states.advance(ticker, rec)
+                bars_applied += applied
+                tail, vix, mask = screen_ticker(state, vix_days, vix_close)
+
+                # Skip bars already in DB
+                rows = [i for i in np.flatnonzero(mask) if (ticker, tail['day'][i]) not in existing_keys]
+                if rows:
+                    # Counted by the fundamentals stage
+                    found.append((ticker, rows, tail, vix))
+                else:
+                    stats['success'] += 1
+            except Exception as e:
+                print(f"  {ticker}: {type(e).__name__}: {e}")
+                stats['error'] += 1
+
+        # Persist and evict the batch's indicator states so memory stays flat
+        states.save()
+        stage['in'] += len(batch)
+        stage['out'] += len(found)
+        stage['seconds'] += time.time() - t
+        print(f"  [{stage['in']}/{stats['tickers']}] Technical candidates: {stage['out']}")
+        yield from found
+        if checkpoint:
+            # Candidates are done once the fundamentals stage has handled them
+            candidates = {c[0] for c in found}
+            checkpoint.mark(t for t in batch if t not in candidates)
+            checkpoint.tick()
+        if on_batch:
+            on_batch()
+
+    states.save()
+    print(f"Indicator state: {bars_applied} bars applied")
+
+def screen_fundamentals(candidates, fundamentals, fetch_infos, existing_keys, stats, stage, checkpoint=None,
+                        on_batch=None):
+    """Stage 3: market cap and fundamentals for technical candidates, FUNDAMENTALS_BATCH at a time; yields signals"""
+    for chunk in batched(candidates, FUNDAMENTALS_BATCH):
+        t = time.time()
+        infos = fundamentals.get_many([c[0] for c in chunk], fetch_infos)
+        signals = []
+        for ticker, rows, tail, vix in chunk:
+            info = infos.get(ticker)
+            if info is None:
+                stats['error'] += 1
                 continue
-
-            df = yf.download(ticker, start=start_date, end=end_date, progress=False)
-            if df is None or len(df) < MIN_BARS:
+            status, fund_score, fund_details = fundamentals_gate(info, FUNDAMENTAL_CONFIG)
+            if status != 'success':
                 stats['skipped'] += 1
                 continue
-
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = [col[0] for col in df.columns]
-
-            close, high, low, volume = df['Close'].values, df['High'].values, df['Low'].values, df['Volume'].values
-            dates = df.index
-
-            close_s = pd.Series(close)
-            high_s = pd.Series(high)
-            low_s = pd.Series(low)
-            vol_s = pd.Series(volume)
-
-            rsi = calc_rsi(close_s, 14).values
-            adx, _, _ = calc_adx(high_s, low_s, close_s, 14)
-            adx = adx.values
-            sma_200 = close_s.rolling(200).mean().values
-            sma_slope = ((pd.Series(sma_200) - pd.Series(sma_200).shift(SMA_SLOPE_DAYS)) / pd.Series(sma_200).shift(SMA_SLOPE_DAYS) * 100).values
-            high_52w = high_s.rolling(252).max().values
-            vol_avg = vol_s.rolling(VOLUME_AVG_DAYS).mean().values
-
-            # Only scan recent dates
-            for i in range(max(260, len(df) - LOOKBACK_DAYS), len(df)):
-                date_str = dates[i].strftime('%Y-%m-%d')
-
-                # Skip if already in DB
-                key = f"{ticker}_{date_str}"
-                if key in existing_keys:
-                    continue
-
-                vix_val = vix_lookup.get(date_str, 15)
-
-                if USE_VIX_FILTER and not (VIX_MIN <= vix_val <= VIX_MAX):
-                    continue
-
-                price = close[i]
-                if np.isnan(sma_200[i]) or np.isnan(high_52w[i]) or np.isnan(adx[i]):
-                    continue
-
-                pct_below = (high_52w[i] - price) / high_52w[i] * 100
-                if not (MIN_BELOW_HIGH_PCT <= pct_below <= MAX_BELOW_HIGH_PCT):
-                    continue
-
-                pct_sma = abs(price - sma_200[i]) / sma_200[i] * 100
-                if pct_sma > MAX_FROM_SMA_PCT or price < sma_200[i] * 0.95:
-                    continue
-
-                if not np.isnan(sma_slope[i]) and sma_slope[i] < -2:
-                    continue
-
-                rsi_sig = any(i-j-1 >= 0 and (rsi[i-j-1] <= RSI_SIGNAL and rsi[i-j] > RSI_SIGNAL or rsi[i-j-1] <= RSI_OVERSOLD)
-                            for j in range(1, RSI_LOOKBACK + 1))
-                if not rsi_sig or adx[i] < ADX_MIN:
-                    continue
-
-                if USE_VOLUME_FILTER:
-                    if np.isnan(vol_avg[i]) or vol_avg[i] == 0 or volume[i] / vol_avg[i] < VOLUME_SURGE_MULT:
-                        continue
-
-                # Signal found!
-                signal = {
-                    'ticker': ticker,
-                    'signal_date': date_str,
-                    'entry_price': round(float(price), 2),
-                    'vix': round(float(vix_val), 1),
-                    'rsi': round(float(rsi[i]), 1),
-                    'adx': round(float(adx[i]), 1),
-                    'pct_below_high': round(float(pct_below), 1),
-                    'sector': info.get('sector', 'Unknown'),
-                    'pe_ratio': round(float(fund_details.get('pe', 0)), 2) if fund_details.get('pe') else None,
-                    'peg_ratio': round(float(fund_details.get('peg', 0)), 2) if fund_details.get('peg') else None,
-                    'roe': round(float(fund_details.get('roe', 0)), 1) if fund_details.get('roe') else None,
-                    'debt_equity': round(float(fund_details.get('de', 0)), 2) if fund_details.get('de') else None,
-                    'fund_score': fund_score,
-                    'status': 'active',
-                }
-                new_signals.append(signal)
-                existing_keys.add(key)
-
+            for i in rows:
+                signals.append(build_signal(ticker, i, tail, vix, info, fund_score, fund_details))
+                existing_keys.add((ticker, tail['day'][i]))
             stats['success'] += 1
+            stage['out'] += 1
+
+        stage['in'] += len(chunk)
+        stage['seconds'] += time.time() - t
+        stats['signals'] += len(signals)
+        yield from signals
+        if checkpoint:
+            checkpoint.mark(c[0] for c in chunk)
+            checkpoint.tick()
+        if on_batch:
+            on_batch()
+
+    fundamentals.save()
+    print(f"Fundamentals cache: {fundamentals.stats}")
+
+def scan_pipeline(tickers, vix_days, vix_close, existing_keys, store, states, fundamentals, download, fetch_infos,
+                  stats, checkpoint=None, deadline=None, on_batch=None):
+    """
+    New signals as a generator pipeline: universe -> prices -> indicators ->
+    fundamentals. Downloads run FETCH_AHEAD batches ahead on a background
+    thread, so the next batch downloads while this one is screened; only one
+    batch of prices and one chunk of candidates is held at a time.
+    Finished tickers are marked on `checkpoint`; no new batch starts after `deadline`;
+    `on_batch` is called after every batch of either screening stage.
+    """
+    stages = {name: {'stage': name, 'in': 0, 'out': 0, 'seconds': 0.0}
+              for name in ('prices', 'technicals', 'fundamentals')}
+    stages['prices']['in'] = len(tickers)
+    stats['stages'].extend(stages.values())
+
+    batches = prefetch(fetch_prices(tickers, store, download, stats, stages['prices'], deadline), FETCH_AHEAD)
+    candidates = screen_technicals(batches, vix_days, vix_close, existing_keys, store, states, stats,
+                                   stages['technicals'], checkpoint, on_batch)
+    return screen_fundamentals(candidates, fundamentals, fetch_infos, existing_keys, stats, stages['fundamentals'],
+                               checkpoint, on_batch)
+
+def drain(signals):
+    """Dry-run sink: runs the pipeline without writing anything"""
+    return {'rows': sum(1 for _ in signals), 'inserted': 0, 'failed': 0}
+
+def print_stages(stages):
+    print(f"\n{'Stage':<14} {'In':>6} {'Out':>6} {'Dropped':>8} {'Seconds':>8}")
+    for s in stages:
+        print(f"{s['stage']:<14} {s['in']:>6} {s['out']:>6} {s['in'] - s['out']:>8} {s['seconds']:>8.1f}")
+
+def scan_for_live_signals(source=None, writer=None, shard=None, resume=True, deadline=None):
+    """
+    Scan for new signals in the last LOOKBACK_DAYS, streaming them to `writer`
+    (a SignalWriter) as they are found; without one nothing is written.
+    shard=(k, N) scans only that part of the universe. Progress is checkpointed,
+    and with resume=True tickers finished earlier today are skipped.
+    Returns stats, with the writer's counts under 'written' and the totals
+    over every attempt of today's run under 'run'.
+    """
+    t0 = time.time()
+    source = source or make_data_source()
+    tickers = shard_tickers(source.universe(SCAN_MODE), shard)
 
-        except Exception as e:
-            stats['error'] += 1
-
-        if (i + 1) % 100 == 0:
-            time.sleep(1)
-
-    return new_signals, stats
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = (datetime.now() - timedelta(days=HISTORY_DAYS)).strftime('%Y-%m-%d')
+
+    stats = {'success': 0, 'skipped': 0, 'error': 0, 'regime': True, 'tickers': len(tickers), 'signals': 0,
+             'stopped': False, 'stages': []}
+    stages = stats['stages']
+    checkpoint = ScanCheckpoint(checkpoint_path(CHECKPOINT_DIR, shard), end_date, shard, resume, CHECKPOINT_SECONDS)
+    todo = checkpoint.remaining(tickers)
+    if len(todo) < len(tickers):
+        print(f"Resuming today's scan: {len(tickers) - len(todo)} tickers done, {len(todo)} left")
+
+    def save_checkpoint(complete=False):
+        written = writer.stats if writer else {}
+        current = {k: stats[k] for k in ('success', 'skipped', 'error', 'signals')}
+        current.update(inserted=written.get('inserted', 0), failed=written.get('failed', 0), seconds=time.time() - t0)
+        return checkpoint.save(current, len(tickers), complete, stats['regime'])
+
+    # Stage 1: VIX regime for the lookback window
+    t = time.time()
+    vix_days, vix_close = load_vix_history(start_date, end_date, source)
+
+    buy_days = vix_gate(vix_close)
+    stats['regime'] = buy_days > 0
+    print(f"VIX buy-zone days in last {LOOKBACK_DAYS}: {buy_days}")
+    stages.append({'stage': 'vix_gate', 'in': len(tickers), 'out': len(tickers) if buy_days else 0,
+                   'seconds': time.time() - t})
+    if not buy_days:
+        print("No day in the VIX buy zone - skipping scan")
+        print_stages(stages)
+        stats['written'] = writer.stats if writer else drain([])
+        stats['run'] = save_checkpoint(complete=True)['counts']
+        return stats
+
+    # Signals already stored for the lookback window (older dates cannot come up again)
+    since = from_day(vix_days[-LOOKBACK_DAYS]) if len(vix_days) >= LOOKBACK_DAYS else start_date
+    existing_keys = load_existing_keys(get_supabase(), since)
+    print(f"Existing signals in DB since {since}: {len(existing_keys)}")
+
+    store = PriceStore(PRICE_STORE_DIR)
+    states = IndicatorStateStore(INDICATOR_STATE_PATH, sma_slope_days=SMA_SLOPE_DAYS, volume_avg_days=VOLUME_AVG_DAYS,
+                                 tail_size=LOOKBACK_DAYS + SIGNAL_CONFIG.rsi_lookback + 1)
+    fundamentals = FundamentalsCache(FUNDAMENTALS_PATH, FUNDAMENTALS_TTL_DAYS, FUNDAMENTALS_MAX_REFRESH)
+
+    # A checkpoint only lists tickers whose signals are written and whose state is on disk
+    def flush_and_save():
+        if writer:
+            writer.flush()
+        states.save()
+        fundamentals.save()
+        save_checkpoint()
+    checkpoint.on_save = flush_and_save
+
+    # Stages 2-3 overlap: prices, indicators, fundamentals and writes stream batch by batch
+    print(f"Screening {len(todo)} tickers in batches of {DOWNLOAD_BATCH_SIZE}...")
+    # The writer's flush timer is checked per batch too, so signals found before
+    # a long stretch without any are not held back until the next one
+    signals = scan_pipeline(todo, vix_days, vix_close, existing_keys, store, states, fundamentals,
+                            source.price_batch, source.infos, stats, checkpoint, deadline,
+                            writer.tick if writer else None)
+    stats['written'] = writer.write(signals) if writer else drain(signals)
+    stats['run'] = save_checkpoint(complete=not stats['stopped'])['counts']
+
+    print(f"Fetch: {source.report()}")
+    print_stages(stages)
+    return stats
 
 # =============================================================================
 # PUSH TO SUPABASE
 # =============================================================================
-def push_signals_to_supabase(signals):
-    """Insert new signals into Supabase"""
-    if not signals:
-        print("No new signals to push")
-        return 0
-
-    print(f"Pushing {len(signals)} signals to Supabase...")
-
-    # Insert in batches
-    batch_size = 50
-    inserted = 0
-
-    for i in range(0, len(signals), batch_size):
-        batch = signals[i:i+batch_size]
-        try:
-            result = supabase.table('signals').upsert(batch).execute()
-            inserted += len(batch)
-            print(f"  Inserted batch {i//batch_size + 1}: {len(batch)} signals")
-        except Exception as e:
-            print(f"  Error inserting batch: {e}")
-
-    return inserted
+def make_signal_writer():
+    """SignalWriter to Postgres (SIGNALS_DSN) or Supabase; None in a dry run"""
+    if SIGNALS_DSN:
+        sink = PostgresSink(SIGNALS_DSN)
+    else:
+        db = get_supabase()
+        if db is None:
+            return None
+        sink = SupabaseSink(db)
+    return SignalWriter(sink, batch_size=WRITE_BATCH_SIZE, in_flight=WRITE_IN_FLIGHT, dead_letter=DEAD_LETTER_PATH)
 
 def log_run(signals_found, new_signals, tickers_scanned, duration, status='success', error=None):
     """Log the screener run"""
     try:
-        supabase.table('screener_runs').insert({
+        db = get_supabase()
+        if db is None:
+            return
+        db.table('screener_runs').insert({
             'signals_found': signals_found,
             'new_signals': new_signals,
             'tickers_scanned': tickers_scanned,
@@ -416,41 +492,125 @@ def log_run(signals_found, new_signals, tickers_scanned, duration, status='succe
 # =============================================================================
 # MAIN
 # =============================================================================
-def main():
+def log_merged_run(paths, run=None):
+    """
+    Final step of a sharded run: one screener_runs row from every shard's
+    checkpoint of `run` (today by default); the only place a sharded run is logged
+    """
+    run = run or datetime.now().strftime('%Y-%m-%d')
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.startswith('scan-')]
+        elif os.path.exists(path):
+            files.append(path)
+    if not files:
+        print("No shard checkpoints found")
+        log_run(0, 0, 0, 0, 'error', 'no shard checkpoints')
+        return None
+    total = merge_checkpoints(files, run)
+    print(f"Merged {total['shards']} shards: {total}")
+
+    if not total['shards']:
+        status, error = 'error', f"no shard checkpoints for {run}"
+    elif not total['regime']:
+        status, error = 'no-regime', None
+    elif not total['complete']:
+        status, error = 'partial', 'incomplete, stale or missing shards'
+    elif total['failed']:
+        status, error = 'partial', f"{total['failed']} signals dead-lettered"
+    else:
+        status, error = 'success', None
+    log_run(total['signals'], total['inserted'], total['tickers'], int(total['seconds']), status, error)
+    return total
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Market Sniper live screener worker')
+    parser.add_argument('--shard', type=parse_shard, help='scan only shard k of N (e.g. 2/4); the run is logged by --merge')
+    parser.add_argument('--merge', nargs='+', metavar='PATH',
+                        help="log one run from the shards' checkpoint files (or directories of them)")
+    parser.add_argument('--no-resume', action='store_true', help="ignore today's checkpoint and scan everything")
+    parser.add_argument('--max-minutes', type=float, default=MAX_RUN_MINUTES,
+                        help='stop starting new batches after this long and save a checkpoint')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
     print("=" * 60)
     print("MARKET SNIPER - Supabase Worker")
     print(f"Time: {datetime.now().isoformat()}")
     print("=" * 60)
 
+    if args.merge:
+        log_merged_run(args.merge)
+        return
+
     start_time = time.time()
+    deadline = start_time + args.max_minutes * 60 if args.max_minutes else None
+    if args.shard:
+        print(f"Shard {args.shard[0]}/{args.shard[1]}")
 
+    writer = None
     try:
-        # Scan for signals
-        signals, stats = scan_for_live_signals()
-
-        print(f"\nScan complete: {stats}")
-        print(f"New signals found: {len(signals)}")
-
-        # Push to Supabase
-        inserted = push_signals_to_supabase(signals)
-
+        # Scan for signals, writing them as they are found (after last run's dead letters)
+        writer = make_signal_writer()
+        if writer:
+            writer.replay()
+        stats = scan_for_live_signals(writer=writer, shard=args.shard, resume=not args.no_resume, deadline=deadline)
+
+        counts = {k: v for k, v in stats.items() if k not in ('stages', 'written', 'run')}
+        print(f"\nScan complete: {counts}")
+
+        written = stats['written']
+        if writer:
+            print(f"Signal writer: {writer.report()}")
+            if written['failed']:
+                print(f"  {written['failed']} signals saved to {DEAD_LETTER_PATH} for the next run")
+        else:
+            print(f"Dry run: {written['rows']} signals not pushed")
+
+        # Totals over every attempt of today's run (resumed runs included)
+        run = stats['run']
         duration = int(time.time() - start_time)
+        if args.shard:
+            print(f"\nDone! Duration: {duration}s (shard totals so far: {run}; logged by --merge)")
+            return
+
+        if not stats['regime']:
+            log_run(0, run['inserted'], 0, duration, status='no-regime')
+            print(f"\nDone! Duration: {duration}s (no VIX buy-zone day, nothing scanned)")
+            return
+
+        print(f"New signals found: {stats['signals']} ({run['signals']} today)")
+
+        if stats['stopped']:
+            status, error = 'partial', 'run time budget reached; re-run to resume'
+        elif run['failed']:
+            status, error = 'partial', f"{run['failed']} signals dead-lettered"
+        else:
+            status, error = 'success', None
         log_run(
-            signals_found=len(signals),
-            new_signals=inserted,
-            tickers_scanned=len(TICKERS),
+            signals_found=run['signals'],
+            new_signals=run['inserted'],
+            tickers_scanned=stats['tickers'],
             duration=duration,
-            status='success'
+            status=status,
+            error=error
         )
 
         print(f"\nDone! Duration: {duration}s")
-        print(f"Inserted {inserted} new signals")
+        print(f"Inserted {written['inserted']} new signals")
 
     except Exception as e:
-        duration = int(time.time() - start_time)
-        log_run(0, 0, len(TICKERS), duration, 'error', str(e))
+        # A failed shard leaves no complete checkpoint for today, so --merge logs the run as partial
+        if not args.shard:
+            duration = int(time.time() - start_time)
+            log_run(0, 0, 0, duration, 'error', str(e))
         print(f"Error: {e}")
         raise
+    finally:
+        if writer:
+            writer.close()
 
 if __name__ == '__main__':
     main()